@@ -0,0 +1,11 @@
+"""
+Load benchmarks against the in-process PostgREST stand-in
+
+Run from the backend directory:
+
+    python -m bench.run                          # all scenarios, compared to bench/baseline.json
+    python -m bench.run -s booking_storm --latency-ms 5
+    python -m bench.run --write-baseline         # record a new baseline
+
+Exits with status 1 when a route regresses against the baseline.
+"""
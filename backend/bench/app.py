@@ -0,0 +1,55 @@
+"""
+The application under test
+"""
+
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from fastapi import FastAPI
+
+# Upstream calls made while serving the current request
+upstream_calls: ContextVar[Optional[List[int]]] = ContextVar("upstream_calls", default=None)
+
+
+def _count():
+    counter = upstream_calls.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class _CountingAuth:
+    def __init__(self, auth):
+        self._auth = auth
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._auth, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            _count()
+            return attribute(*args, **kwargs)
+        return call
+
+
+class CountingBackend:
+    """Wraps a backend and attributes each database/auth call to the current request"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.auth = _CountingAuth(backend.auth)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def close(self):
+        await self.backend.close()
+
+    async def execute(self, query):
+        _count()
+        return await self.backend.execute(query)
+
+
+def load_app(backend) -> FastAPI:
+    from main import create_app
+    return create_app(backend=backend)
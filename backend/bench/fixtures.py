@@ -0,0 +1,160 @@
+"""
+Seed data for benchmarks: a few clinics with staff, doctors, patients and a
+realistic day of appointments, plus pre-issued tokens for every user
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List
+import random
+
+from services.memory_backend import MemoryBackend
+
+PASSWORD = "bench123"
+ALL_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+@dataclass
+class Clinic:
+    id: str
+    admin: str
+    receptionist: str
+    pharmacist: str
+    doctors: List[str] = field(default_factory=list)
+    doctor_users: Dict[str, str] = field(default_factory=dict)
+    patients: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Fixture:
+    tables: Dict[str, List[Dict[str, Any]]]
+    clinics: List[Clinic]
+    emails: Dict[str, str]
+    today: date
+
+    def backend(self, latency_seconds: float = 0.0) -> MemoryBackend:
+        backend = MemoryBackend(self.tables, latency_seconds=latency_seconds)
+        for auth_user_id, email in self.emails.items():
+            backend.auth.add_user(email, PASSWORD, auth_user_id)
+        return backend
+
+
+def _time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def build_fixture(
+    clinics: int = 3,
+    doctors_per_clinic: int = 4,
+    patients_per_clinic: int = 200,
+    appointments_per_doctor: int = 24,
+    seed: int = 7,
+) -> Fixture:
+    rng = random.Random(seed)
+    today = date.today()
+    tables: Dict[str, List[Dict[str, Any]]] = {
+        name: [] for name in ("users", "doctors", "patients", "appointments", "pharmacy_items", "lab_tests", "accounts_tx")
+    }
+    emails: Dict[str, str] = {}
+    result: List[Clinic] = []
+
+    def add_user(user_id: str, role: str, clinic_id: str) -> str:
+        auth_user_id = f"auth-{user_id}"
+        email = f"{user_id}@bench-clinic.com"
+        tables["users"].append({
+            "id": user_id,
+            "auth_user_id": auth_user_id,
+            "email": email,
+            "role": role,
+            "clinic_id": clinic_id,
+            "is_active": True,
+        })
+        emails[auth_user_id] = email
+        return auth_user_id
+
+    for c in range(clinics):
+        clinic_id = f"clinic-{c}"
+        clinic = Clinic(
+            id=clinic_id,
+            admin=add_user(f"admin-{c}", "admin", clinic_id),
+            receptionist=add_user(f"reception-{c}", "receptionist", clinic_id),
+            pharmacist=add_user(f"pharmacy-{c}", "pharmacist", clinic_id),
+        )
+
+        for p in range(patients_per_clinic):
+            patient_id = f"patient-{c}-{p}"
+            tables["patients"].append({
+                "id": patient_id,
+                "clinic_id": clinic_id,
+                "first_name": f"Patient{p}",
+                "last_name": f"Clinic{c}",
+                "phone": f"+91{c:02d}{p:08d}",
+            })
+            clinic.patients.append(patient_id)
+
+        for d in range(doctors_per_clinic):
+            doctor_id = f"doctor-{c}-{d}"
+            user_id = f"doctor-user-{c}-{d}"
+            clinic.doctor_users[doctor_id] = add_user(user_id, "doctor", clinic_id)
+            tables["doctors"].append({
+                "id": doctor_id,
+                "clinic_id": clinic_id,
+                "user_id": user_id,
+                "name": f"Dr {c}-{d}",
+                "speciality": "General Medicine",
+                "consultation_fee": 500,
+                "slot_duration_minutes": 10,
+                "start_time": "09:00:00",
+                "end_time": "17:00:00",
+                "available_days": ALL_DAYS,
+                "is_active": True,
+            })
+            clinic.doctors.append(doctor_id)
+
+            # Today's list: every other 10-minute slot from 09:00
+            for token in range(1, appointments_per_doctor + 1):
+                tables["appointments"].append({
+                    "id": f"appointment-{c}-{d}-{token}",
+                    "clinic_id": clinic_id,
+                    "doctor_id": doctor_id,
+                    "patient_id": rng.choice(clinic.patients),
+                    "appointment_date": today.isoformat(),
+                    "appointment_time": _time(9 * 60 + 20 * (token - 1)),
+                    "status": rng.choice(["scheduled", "confirmed", "confirmed", "completed"]),
+                    "token_number": token,
+                    "consultation_fee": 500,
+                })
+
+        for i in range(100):
+            tables["pharmacy_items"].append({
+                "id": f"item-{c}-{i}",
+                "clinic_id": clinic_id,
+                "name": f"Medicine {i}",
+                "quantity_available": rng.randint(0, 200),
+                "reorder_level": 20,
+                "expiry_date": (today + timedelta(days=rng.randint(1, 400))).isoformat(),
+                "is_active": True,
+            })
+
+        for i in range(50):
+            tables["lab_tests"].append({
+                "id": f"lab-{c}-{i}",
+                "clinic_id": clinic_id,
+                "patient_id": rng.choice(clinic.patients),
+                "status": rng.choice(["ordered", "collected", "processing", "completed"]),
+            })
+
+        for i in range(300):
+            tables["accounts_tx"].append({
+                "id": f"tx-{c}-{i}",
+                "clinic_id": clinic_id,
+                "transaction_type": rng.choice(["income", "income", "expense"]),
+                "amount": round(rng.uniform(100, 5000), 2),
+                "category": rng.choice(["consultation", "pharmacy", "lab", "supplies"]),
+                "payment_method": rng.choice(["cash", "card", "upi"]),
+                "transaction_date": (today - timedelta(days=rng.randint(0, 30))).isoformat(),
+            })
+
+        result.append(clinic)
+
+    return Fixture(tables=tables, clinics=result, emails=emails, today=today)
@@ -0,0 +1,257 @@
+"""
+Index coverage check: drives the bench scenarios, records the filter and order
+shape of every query the routers build, and reports the shapes that no index
+declared in supabase/migrations serves
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import argparse
+import asyncio
+import re
+import sys
+
+from services.db import Query, db
+
+from .run import DEFAULT_SETTINGS, run_scenario
+from .scenarios import SCENARIOS
+
+MIGRATIONS_PATH = Path(__file__).resolve().parents[2] / "supabase" / "migrations"
+
+EQUALITY_OPERATORS = ("eq", "in", "is")
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+# Status enums and flags: a handful of values, cheap to filter once the rest
+# of the condition has narrowed the scan, so an index need not lead with them
+RESIDUAL_COLUMNS = frozenset({"status", "is_active"})
+
+_INDEX = re.compile(
+    r"CREATE\s+(UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s+"
+    r"ON\s+(?:ONLY\s+)?(?:\w+\.)?(\w+)\s*(?:USING\s+\w+\s*)?\((.*?)\)\s*(?:WHERE\s+(.*?))?;",
+    re.IGNORECASE | re.DOTALL,
+)
+_DROP_INDEX = re.compile(r"DROP\s+INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+EXISTS\s+)?(?:\w+\.)?(\w+)", re.IGNORECASE)
+_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:\w+\.)?(\w+)\s*\((.*?)\);", re.IGNORECASE | re.DOTALL)
+_TABLE_KEY = re.compile(r"^(?:CONSTRAINT\s+\w+\s+)?(?:PRIMARY\s+KEY|UNIQUE)\s*\(([^)]*)\)", re.IGNORECASE)
+_COLUMN_KEY = re.compile(r"^(\w+)\s.*\b(?:PRIMARY\s+KEY|UNIQUE)\b", re.IGNORECASE)
+_PREDICATE_KEYWORDS = frozenset({"and", "or", "not", "in", "is", "null", "true", "false", "between", "like", "coalesce"})
+
+
+class Index(NamedTuple):
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+    unique: bool = False
+    # Columns a partial index's WHERE clause constrains
+    predicate: frozenset = frozenset()
+
+
+class QueryShape(NamedTuple):
+    method: str
+    table: str
+    equality: Tuple[str, ...]
+    ranges: Tuple[str, ...]
+    orders: Tuple[Tuple[str, bool], ...]
+    limited: bool
+
+    def describe(self) -> str:
+        filters = [f"{column}=" for column in self.equality] + [f"{column}~" for column in self.ranges]
+        shape = f"{self.method} {self.table} [{', '.join(filters)}]"
+        if self.orders:
+            shape += " order=" + ",".join(f"{column}{' desc' if desc else ''}" for column, desc in self.orders)
+        return shape + (" limit" if self.limited else "")
+
+
+class Coverage(NamedTuple):
+    index: Optional[Index]
+    covered: bool
+    missing: Tuple[str, ...]
+
+
+def _strip_comments(sql: str) -> str:
+    sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.DOTALL)
+    return re.sub(r"--[^\n]*", "", sql)
+
+
+def _split_columns(text: str) -> List[str]:
+    """Top-level comma-separated items of a column or definition list"""
+    items, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current.append(char)
+    items.append("".join(current).strip())
+    return [item for item in items if item]
+
+
+def _index_column(item: str) -> str:
+    # Expressions such as lower(email) are kept whole and never match a filter
+    return item if "(" in item else item.split()[0].strip('"').lower()
+
+
+def _predicate_columns(predicate: str) -> frozenset:
+    words = re.findall(r"[a-z_]\w*", re.sub(r"'[^']*'", "", predicate.lower()))
+    return frozenset(word for word in words if word not in _PREDICATE_KEYWORDS)
+
+
+def load_indexes(directory: Path = MIGRATIONS_PATH) -> Dict[str, List[Index]]:
+    """Indexes per table after applying every migration in order, keys included"""
+    indexes: Dict[str, Index] = {}
+    for path in sorted(directory.glob("*.sql")):
+        sql = _strip_comments(path.read_text())
+        for match in _TABLE.finditer(sql):
+            table = match.group(1).lower()
+            for item in _split_columns(match.group(2)):
+                key = _TABLE_KEY.match(item)
+                if key:
+                    columns = tuple(_index_column(column) for column in _split_columns(key.group(1)))
+                else:
+                    key = _COLUMN_KEY.match(item)
+                    if not key:
+                        continue
+                    columns = (key.group(1).lower(),)
+                name = f"{table}_{'_'.join(columns)}_key"
+                indexes[name] = Index(name, table, columns, unique=True)
+        for match in _INDEX.finditer(sql):
+            unique, name, table, columns, predicate = match.groups()
+            indexes[name.lower()] = Index(
+                name.lower(),
+                table.lower(),
+                tuple(_index_column(column) for column in _split_columns(columns)),
+                unique=bool(unique),
+                predicate=_predicate_columns(predicate or ""),
+            )
+        for match in _DROP_INDEX.finditer(sql):
+            indexes.pop(match.group(1).lower(), None)
+
+    by_table: Dict[str, List[Index]] = {}
+    for index in indexes.values():
+        by_table.setdefault(index.table, []).append(index)
+    return by_table
+
+
+def shape_of(query: Query) -> Optional[QueryShape]:
+    """Indexable part of a filtered query; None for inserts, RPCs and unfiltered scans"""
+    if query.method not in ("select", "update", "delete") or not (query.filters or query.orders):
+        return None
+    equality, ranges = [], []
+    for condition in query.filters:
+        # Negations and or() groups are residual filters an index cannot seek on
+        if condition.operator in EQUALITY_OPERATORS and condition.column not in equality:
+            equality.append(condition.column)
+        elif condition.operator in RANGE_OPERATORS and condition.column not in ranges:
+            ranges.append(condition.column)
+    return QueryShape(
+        query.method,
+        query.table,
+        tuple(equality),
+        tuple(column for column in ranges if column not in equality),
+        tuple(query.orders),
+        query.limit_count is not None,
+    )
+
+
+def coverage(shape: QueryShape, index: Index) -> Coverage:
+    """How much of ``shape`` a b-tree scan of ``index`` can serve
+
+    Equality columns must form a prefix of the index (in any order); the next
+    column may then serve one range filter and/or the sort. The sort only
+    counts when the query is limited, since a full result is cheap to sort.
+    ``RESIDUAL_COLUMNS`` may be left to a filter, but something must be served.
+    """
+    if not index.predicate <= set(shape.equality + shape.ranges):
+        # A partial index is only usable when the query restates its condition
+        return Coverage(index, False, tuple(column for column in shape.equality + shape.ranges if column not in RESIDUAL_COLUMNS))
+    served = set(index.predicate)
+    position = 0
+    while position < len(index.columns) and index.columns[position] in shape.equality:
+        served.add(index.columns[position])
+        position += 1
+    if position and index.unique and position == len(index.columns):
+        # Pinned to a single row; whatever else is filtered does not matter
+        return Coverage(index, True, ())
+
+    tail = index.columns[position:]
+    if shape.ranges and tail and tail[0] in shape.ranges:
+        served.add(tail[0])
+    missing = [column for column in shape.equality + shape.ranges if column not in served and column not in RESIDUAL_COLUMNS]
+
+    orders = [column for column, _ in shape.orders if column not in shape.equality]
+    if shape.limited and orders and tuple(orders) != tail[:len(orders)]:
+        missing += [f"order {column}" for column in orders if column not in missing]
+    return Coverage(index, served != set() and not missing, tuple(missing))
+
+
+def best_coverage(shape: QueryShape, indexes: Iterable[Index]) -> Coverage:
+    best = Coverage(None, False, tuple(column for column in shape.equality + shape.ranges if column not in RESIDUAL_COLUMNS))
+    for index in indexes:
+        candidate = coverage(shape, index)
+        if (candidate.covered, -len(candidate.missing)) > (best.covered, -len(best.missing)):
+            best = candidate
+    return best
+
+
+def suggest(shape: QueryShape) -> str:
+    """An index that would cover ``shape``: equality columns, then the sort or one range column"""
+    columns = [column for column in shape.equality if column not in RESIDUAL_COLUMNS] or list(shape.equality)
+    orders = [column for column, _ in shape.orders if column not in shape.equality]
+    if shape.limited and orders:
+        columns += orders
+    elif shape.ranges:
+        columns.append(shape.ranges[0])
+    return f"{shape.table} ({', '.join(columns)})"
+
+
+async def record_shapes(scenarios: List[str], requests: int) -> Counter:
+    shapes: Counter = Counter()
+
+    def record(query: Query, seconds: float):
+        shape = shape_of(query)
+        if shape is not None:
+            shapes[shape] += 1
+
+    db.add_query_hook(record)
+    settings = {**DEFAULT_SETTINGS, "requests": requests, "latency_ms": 0.0}
+    for name in scenarios:
+        await run_scenario(name, settings)
+    return shapes
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.index_coverage", description=__doc__)
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="scenario to run (repeatable; default all)")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--migrations", type=Path, default=MIGRATIONS_PATH)
+    parser.add_argument("--all", action="store_true", help="also list covered shapes")
+    args = parser.parse_args(argv)
+
+    indexes = load_indexes(args.migrations)
+    shapes = await record_shapes(args.scenario or list(SCENARIOS), args.requests)
+
+    uncovered = 0
+    print(f"{len(shapes)} query shapes, {sum(len(table) for table in indexes.values())} indexes\n")
+    for shape, count in sorted(shapes.items(), key=lambda item: (item[0].table, -item[1])):
+        result = best_coverage(shape, indexes.get(shape.table, []))
+        if result.covered:
+            if args.all:
+                print(f"  ok       {shape.describe()}  x{count}  via {result.index.name}")
+            continue
+        uncovered += 1
+        partial = f" (best: {result.index.name})" if result.index else ""
+        print(f"  MISSING  {shape.describe()}  x{count}{partial}")
+        print(f"           unserved: {', '.join(result.missing)}; suggest {suggest(shape)}")
+
+    if uncovered:
+        print(f"\n{uncovered} uncovered query shapes")
+        return 1
+    print("\nEvery recorded query shape is served by an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
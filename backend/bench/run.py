@@ -0,0 +1,209 @@
+"""
+Benchmark runner: drives each scenario through the ASGI app and reports
+throughput, latency percentiles and upstream calls per request for every route
+"""
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-not-for-production-use-0000")
+os.environ.setdefault("NOTIFICATION_OUTBOX_PATH", ":memory:")
+os.environ.setdefault("NOTIFICATION_PROVIDER", "fake")
+
+import httpx
+
+from services.admission import SlidingWindowThrottle, auth_gate
+from services.availability import availability
+from services.principal_cache import principal_cache
+from services.reservations import reservations
+
+from .app import CountingBackend, load_app, upstream_calls
+from .fixtures import build_fixture
+from .scenarios import SCENARIOS, Operation
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+DEFAULT_SETTINGS = {"requests": 400, "concurrency": 32, "latency_ms": 2.0, "seed": 7}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(name: str, settings: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    from routers.auth import create_access_token
+
+    fixture = build_fixture(seed=settings["seed"])
+    app = load_app(CountingBackend(fixture.backend(settings["latency_ms"] / 1000)))
+    principal_cache.clear()
+    reservations.forget()
+    availability.forget()
+    # Every bench client shares one address and a handful of accounts; keep the
+    # pool and queue limits but lift the per-email/IP throttles
+    auth_gate.by_email = SlidingWindowThrottle(limit=10**9)
+    auth_gate.by_ip = SlidingWindowThrottle(limit=10**9)
+
+    rng = random.Random(settings["seed"])
+    operations = SCENARIOS[name].build(fixture, rng, settings["requests"])
+    tokens = {user: create_access_token(data={"sub": user}) for user in fixture.emails}
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    calls: Dict[str, List[int]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    pending = iter(operations)
+
+    async def worker(client: httpx.AsyncClient):
+        for operation in pending:
+            headers = {"Authorization": f"Bearer {tokens[operation.user]}"} if operation.user else {}
+            counter = [0]
+            reset = upstream_calls.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(operation.method, operation.path, headers=headers, json=operation.json)
+                ok = response.status_code in operation.ok_statuses
+            except Exception:
+                ok = False
+            finally:
+                upstream_calls.reset(reset)
+            latencies[operation.route].append(time.perf_counter() - started)
+            calls[operation.route].append(counter[0])
+            errors[operation.route] += not ok
+            # A fully cached request never awaits anything in-process; yield so
+            # one client cannot starve the others the way no real socket would
+            await asyncio.sleep(0)
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(settings["concurrency"])))
+        elapsed = time.perf_counter() - started
+
+    return {
+        route: {
+            "requests": len(samples),
+            "errors": errors[route],
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            "upstream_calls": round(sum(calls[route]) / len(samples), 2),
+        }
+        for route, samples in sorted(latencies.items())
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, gate_latency: bool = False) -> Tuple[List[str], List[str]]:
+    """Regressions and latency notes of ``results`` against ``baseline``
+
+    Upstream calls per request and error rates do not depend on the machine, so
+    they are the gate. Latency and throughput are only comparable on the machine
+    that recorded the baseline; they are reported, and gate only when asked.
+    """
+    regressions, notes = [], []
+    for scenario, routes in baseline["scenarios"].items():
+        if scenario not in results:
+            continue
+        for route, base in routes.items():
+            current = results[scenario].get(route)
+            label = f"{scenario}: {route}"
+            if current is None:
+                regressions.append(f"{label} was not exercised")
+                continue
+            if current["upstream_calls"] > base["upstream_calls"] * 1.05 + 0.05:
+                regressions.append(f"{label} upstream calls {base['upstream_calls']} -> {current['upstream_calls']}")
+            if current["errors"] / current["requests"] > base["errors"] / base["requests"] + 0.01:
+                regressions.append(f"{label} errors {base['errors']} -> {current['errors']}")
+            timing = regressions if gate_latency else notes
+            if current["p95_ms"] > base["p95_ms"] * (1 + tolerance) + 1:
+                timing.append(f"{label} p95 {base['p95_ms']}ms -> {current['p95_ms']}ms ({current['p95_ms'] / base['p95_ms']:.2f}x)")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                timing.append(
+                    f"{label} throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s "
+                    f"({current['throughput_rps'] / base['throughput_rps']:.2f}x)"
+                )
+    return regressions, notes
+
+
+def print_report(results: Dict[str, Any], settings: Dict[str, Any]):
+    print(
+        f"requests={settings['requests']} concurrency={settings['concurrency']} "
+        f"latency={settings['latency_ms']}ms seed={settings['seed']}"
+    )
+    header = f"{'route':<42}{'reqs':>6}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls':>7}"
+    for scenario, routes in results.items():
+        print(f"\n[{scenario}]")
+        print(header)
+        for route, stats in routes.items():
+            print(
+                f"{route:<42}{stats['requests']:>6}{stats['errors']:>5}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['upstream_calls']:>7}"
+            )
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__)
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="scenario to run (repeatable; default all)")
+    parser.add_argument("-n", "--requests", type=int, help="requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, help="concurrent clients")
+    parser.add_argument("--latency-ms", type=float, help="simulated database round trip")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="latency/throughput slack before a change is reported (0.5 = 50%%)")
+    parser.add_argument("--gate-latency", action="store_true", help="fail on latency/throughput changes too (same machine as the baseline only)")
+    parser.add_argument("--write-baseline", action="store_true", help="store these results as the new baseline (only when call counts change on purpose)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if not args.write_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    # Compare like with like: unset options fall back to the baseline's settings
+    settings = {**DEFAULT_SETTINGS, **(baseline or {}).get("settings", {})}
+    for name in DEFAULT_SETTINGS:
+        if getattr(args, name) is not None:
+            settings[name] = getattr(args, name)
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        results[name] = await run_scenario(name, settings)
+
+    print_report(results, settings)
+    document = {"settings": settings, "scenarios": results}
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2) + "\n")
+    if args.write_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        return 0
+
+    if baseline.get("settings") != settings:
+        print("\nSettings differ from the baseline; skipping comparison")
+        return 0
+    regressions, notes = compare(results, baseline, args.tolerance, args.gate_latency)
+    if notes:
+        print("\nLatency changes against baseline (not gated):")
+        for note in notes:
+            print(f"  {note}")
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
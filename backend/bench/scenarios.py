@@ -0,0 +1,179 @@
+"""
+Request mixes modelled on how the front end drives the API
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import random
+
+from .fixtures import PASSWORD, Fixture
+
+
+@dataclass
+class Operation:
+    route: str
+    method: str
+    path: str
+    user: Optional[str] = None
+    json: Any = None
+    ok_statuses: Tuple[int, ...] = (200,)
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    build: Callable[[Fixture, random.Random, int], List[Operation]]
+
+
+def reception_dashboard(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Receptionists refreshing the overview, the day list and a doctor's queue"""
+    today = fixture.today.isoformat()
+    operations = []
+    while len(operations) < count:
+        clinic = rng.choice(fixture.clinics)
+        doctor_id = rng.choice(clinic.doctors)
+        operations += [
+            Operation("GET /metrics/overview", "GET", "/metrics/overview", clinic.receptionist),
+            Operation("GET /metrics/dashboard/receptionist", "GET", "/metrics/dashboard/receptionist", clinic.receptionist),
+            Operation("GET /appointments/", "GET", f"/appointments/?date_filter={today}&limit=50", clinic.receptionist),
+            Operation("GET /appointments/queue/{doctor_id}", "GET", f"/appointments/queue/{doctor_id}", clinic.receptionist),
+        ]
+    return operations[:count]
+
+
+def booking_storm(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Many receptionists booking tomorrow at once; some of them race for the same slot"""
+    tomorrow = (fixture.today + timedelta(days=1)).isoformat()
+    # Fewer distinct slots than bookings, so a good share of requests collide
+    doctors = sum(len(clinic.doctors) for clinic in fixture.clinics)
+    slots = [f"{9 + minute // 60:02d}:{minute % 60:02d}" for minute in range(0, 480, 5)]
+    slots = slots[: max(1, int(count * 0.8 / doctors))]
+    operations = []
+    for _ in range(count):
+        clinic = rng.choice(fixture.clinics)
+        operations.append(Operation(
+            "POST /appointments/",
+            "POST",
+            "/appointments/",
+            clinic.receptionist,
+            json={
+                "patient_id": rng.choice(clinic.patients),
+                "doctor_id": rng.choice(clinic.doctors),
+                "appointment_date": tomorrow,
+                "appointment_time": rng.choice(slots),
+            },
+            ok_statuses=(200, 409),
+        ))
+    return operations
+
+
+def queue_polling(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Doctors' screens polling their own queue"""
+    operations = []
+    for _ in range(count):
+        clinic = rng.choice(fixture.clinics)
+        doctor_id = rng.choice(clinic.doctors)
+        operations.append(Operation(
+            "GET /appointments/queue/{doctor_id}",
+            "GET",
+            f"/appointments/queue/{doctor_id}",
+            clinic.doctor_users[doctor_id],
+        ))
+    return operations
+
+
+def pharmacy_dashboard(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Pharmacists' stock alert panels"""
+    return [
+        Operation("GET /metrics/dashboard/pharmacist", "GET", "/metrics/dashboard/pharmacist", rng.choice(fixture.clinics).pharmacist)
+        for _ in range(count)
+    ]
+
+
+def login_burst(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Start-of-shift logins"""
+    emails = list(fixture.emails.values())
+    return [
+        Operation("POST /auth/login", "POST", "/auth/login", json={"email": rng.choice(emails), "password": PASSWORD})
+        for _ in range(count)
+    ]
+
+
+def slot_search(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Reception looking for the next free slots while bookings keep landing"""
+    searches = []
+    for _ in range(count - count // 4):
+        clinic = rng.choice(fixture.clinics)
+        path = "/appointments/availability?limit=10"
+        if rng.random() < 0.5:
+            path += f"&doctor_id={rng.choice(clinic.doctors)}"
+        searches.append(Operation("GET /appointments/availability", "GET", path, clinic.receptionist))
+    bookings = booking_storm(fixture, rng, count - len(searches))
+    operations = searches + bookings
+    rng.shuffle(operations)
+    return operations
+
+
+def shift_change(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Logins arriving while doctors' screens keep polling their queues"""
+    logins = login_burst(fixture, rng, count // 2)
+    polls = queue_polling(fixture, rng, count - len(logins))
+    return [operation for pair in zip(polls, logins) for operation in pair] + polls[len(logins):]
+
+
+def route_sweep(fixture: Fixture, rng: random.Random, count: int) -> List[Operation]:
+    """Every API route in turn, so queries the other mixes never build are exercised too"""
+    today = fixture.today.isoformat()
+    tomorrow = (fixture.today + timedelta(days=1)).isoformat()
+    appointments = {clinic.id: [a for a in fixture.tables["appointments"] if a["clinic_id"] == clinic.id] for clinic in fixture.clinics}
+    operations = []
+    while len(operations) < count:
+        clinic = rng.choice(fixture.clinics)
+        doctor_id = rng.choice(clinic.doctors)
+        doctor = clinic.doctor_users[doctor_id]
+        appointment = rng.choice(appointments[clinic.id])
+        owner = clinic.doctor_users[appointment["doctor_id"]]
+        booking = {
+            "patient_id": rng.choice(clinic.patients),
+            "doctor_id": doctor_id,
+            "appointment_date": tomorrow,
+            "appointment_time": f"{rng.randint(9, 16):02d}:{rng.choice(range(0, 60, 10)):02d}",
+        }
+        operations += [
+            Operation("GET /appointments/", "GET", f"/appointments/?doctor_id={doctor_id}&status=confirmed", clinic.receptionist),
+            Operation("GET /appointments/", "GET", f"/appointments/?date_filter={today}", doctor),
+            Operation("GET /appointments/export", "GET", f"/appointments/export?start_date={today}&end_date={tomorrow}", clinic.receptionist),
+            Operation("GET /appointments/availability", "GET", "/appointments/availability?speciality=General%20Medicine", clinic.receptionist),
+            Operation("GET /appointments/{appointment_id}", "GET", f"/appointments/{appointment['id']}", clinic.receptionist, ok_statuses=(200, 404)),
+            Operation("PATCH /appointments/{appointment_id}", "PATCH", f"/appointments/{appointment['id']}", owner, json={"notes": "Reviewed"}, ok_statuses=(200, 404)),
+            Operation("POST /appointments/", "POST", "/appointments/", clinic.receptionist, json=booking, ok_statuses=(200, 409)),
+            Operation("POST /appointments/bulk", "POST", "/appointments/bulk", clinic.receptionist, json=[booking], ok_statuses=(200, 409)),
+            Operation("POST /appointments/transitions", "POST", "/appointments/transitions", owner, json=[{"id": appointment["id"], "status": "in_progress"}]),
+            Operation("DELETE /appointments/{appointment_id}", "DELETE", f"/appointments/{rng.choice(appointments[clinic.id])['id']}", clinic.admin, ok_statuses=(200, 404)),
+            Operation("GET /appointments/queue/{doctor_id}", "GET", f"/appointments/queue/{doctor_id}", doctor),
+            Operation("GET /metrics/overview", "GET", "/metrics/overview", clinic.admin),
+            Operation("GET /metrics/revenue", "GET", f"/metrics/revenue?start_date={today}", clinic.admin),
+            Operation("GET /metrics/dashboard/{role}", "GET", "/metrics/dashboard/doctor", doctor),
+            Operation("GET /metrics/dashboard/{role}", "GET", "/metrics/dashboard/receptionist", clinic.receptionist),
+            Operation("GET /metrics/dashboard/{role}", "GET", "/metrics/dashboard/pharmacist", clinic.pharmacist),
+            Operation("GET /auth/me", "GET", "/auth/me", clinic.admin),
+            Operation("POST /auth/login", "POST", "/auth/login", json={"email": fixture.emails[clinic.admin], "password": PASSWORD}),
+        ]
+    return operations[:count]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("reception_dashboard", "overview, day list and queue refreshes", reception_dashboard),
+        Scenario("booking_storm", "concurrent bookings with slot collisions", booking_storm),
+        Scenario("queue_polling", "doctor queue polling", queue_polling),
+        Scenario("pharmacy_dashboard", "pharmacist stock alerts", pharmacy_dashboard),
+        Scenario("login_burst", "start-of-shift logins", login_burst),
+        Scenario("slot_search", "next-free-slot searches mixed with bookings", slot_search),
+        Scenario("shift_change", "logins mixed with queue polling", shift_change),
+        Scenario("route_sweep", "every route in turn", route_sweep),
+    )
+}
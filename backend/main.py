@@ -3,50 +3,164 @@
 Main FastAPI application entry point
 """
 
-from dotenv import load_dotenv
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from typing import NamedTuple, Optional
+import importlib
+import logging
+import time
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-# Import routers
-from routers import auth, metrics, clinics, appointments, pharmacy, accounts, patients, doctors, staff, lab, modules
+from services.settings import Settings, get_settings
 
-# Load environment variables
-load_dotenv()
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="HealthCare Management API", version="1.0.0")
+class RouterSpec(NamedTuple):
+    module: str
+    prefix: str
+    tag: str
+    include_in_schema: bool = True
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Routers are imported when the app is built; modules not present in this
+# deployment are skipped instead of failing the boot
+ROUTERS = (
+    RouterSpec("routers.auth", "/auth", "Authentication"),
+    RouterSpec("routers.metrics", "/metrics", "Metrics"),
+    RouterSpec("routers.modules", "/modules", "Modules"),
+    RouterSpec("routers.clinics", "/clinics", "Clinics"),
+    RouterSpec("routers.appointments", "/appointments", "Appointments"),
+    RouterSpec("routers.pharmacy", "/pharmacy", "Pharmacy"),
+    RouterSpec("routers.accounts", "/accounts", "Accounts"),
+    RouterSpec("routers.patients", "/patients", "Patients"),
+    RouterSpec("routers.doctors", "/doctors", "Doctors"),
+    RouterSpec("routers.staff", "/staff", "Staff"),
+    RouterSpec("routers.lab", "/lab", "Laboratory"),
+    # Prometheus scrape target; kept apart from the dashboard /metrics router
+    RouterSpec("routers.internal", "/internal", "Internal", include_in_schema=False),
 )
 
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
-app.include_router(modules.router, prefix="/modules", tags=["Modules"])
-app.include_router(clinics.router, prefix="/clinics", tags=["Clinics"])
-app.include_router(appointments.router, prefix="/appointments", tags=["Appointments"])
-app.include_router(pharmacy.router, prefix="/pharmacy", tags=["Pharmacy"])
-app.include_router(accounts.router, prefix="/accounts", tags=["Accounts"])
-app.include_router(patients.router, prefix="/patients", tags=["Patients"])
-app.include_router(doctors.router, prefix="/doctors", tags=["Doctors"])
-app.include_router(staff.router, prefix="/staff", tags=["Staff"])
-app.include_router(lab.router, prefix="/lab", tags=["Laboratory"])
-
-@app.get("/")
-async def root():
-    return {"message": "HealthCare Management API is running"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+def include_routers(app: FastAPI, manifest=ROUTERS):
+    for spec in manifest:
+        try:
+            module = importlib.import_module(spec.module)
+        except ModuleNotFoundError as e:
+            # Only a missing router is skipped; a router with a broken import still fails loudly
+            if e.name != spec.module:
+                raise
+            logger.warning("Router %s is not available; %s is not mounted", spec.module, spec.prefix)
+            continue
+        app.include_router(module.router, prefix=spec.prefix, tags=[spec.tag], include_in_schema=spec.include_in_schema)
+        app.state.routers.append(spec.module)
+
+async def warmup(app: FastAPI):
+    """Pay cold-start costs before the first real request does"""
+    from services.db import db
+
+    started = time.perf_counter()
+    # Route schemas and the OpenAPI document are built lazily on first use
+    app.openapi()
+    # Open the pooled upstream connection (TLS and HTTP/2 handshakes)
+    try:
+        await db.table("users").select("id").limit(1).execute()
+    except Exception:
+        logger.warning("Warmup query failed; continuing startup", exc_info=True)
+    logger.info("Warmup finished in %.0fms", (time.perf_counter() - started) * 1000)
+
+def create_app(settings: Optional[Settings] = None, backend=None) -> FastAPI:
+    """Build the application; ``backend`` swaps the data layer (e.g. MemoryBackend)"""
+
+    # Settings (and .env) are loaded before any service module reads its configuration
+    explicit_settings = settings is not None
+    settings = settings or get_settings()
+
+    from services.db import db
+    from services.admission import auth_gate
+    from services.counters import counter_reconciler
+    from services.idempotency import IdempotencyMiddleware
+    from services.instrumentation import InstrumentationMiddleware
+    from services.notifications import notifications
+    from services.revocation import revocations
+    from services.response_cache import CacheRule, ResponseCacheMiddleware
+    from routers.auth import cached_principal, decode_token_subject
+
+    if backend is not None:
+        db.configure(backend)
+    if explicit_settings:
+        # The key ring was built from the environment when it was imported
+        from services.keyring import key_ring
+        key_ring.configure(settings)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Shared clients are opened once per worker and closed on shutdown
+        await db.connect()
+        counter_reconciler.start()
+        await revocations.start()
+        await notifications.start()
+        if settings.warmup_on_startup:
+            await warmup(app)
+        yield
+        await notifications.stop()
+        await revocations.stop()
+        await counter_reconciler.stop()
+        auth_gate.shutdown()
+        await db.disconnect()
+
+    app = FastAPI(title="HealthCare Management API", version="1.0.0", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.routers = []
+
+    # Cache read-mostly GET routes as pre-serialized, pre-gzipped bytes with ETags
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        rules=[
+            CacheRule("/modules/preview", ttl_seconds=3600),
+            CacheRule("/modules/v1", ttl_seconds=3600),
+            CacheRule("/metrics/overview", ttl_seconds=15, per_clinic=True),
+        ],
+        principal_lookup=cached_principal,
+    )
+
+    # Retried creates replay the original response instead of running again
+    app.add_middleware(
+        IdempotencyMiddleware,
+        paths=["/appointments/", "/auth/register"],
+        subject_lookup=decode_token_subject,
+        ttl_seconds=settings.idempotency_ttl_seconds,
+    )
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Outermost, so cache hits and CORS preflights are measured too
+    app.add_middleware(InstrumentationMiddleware, slow_request_seconds=settings.slow_request_seconds)
+
+    include_routers(app)
+
+    @app.get("/")
+    async def root():
+        return {"message": "HealthCare Management API is running"}
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    return app
+
+def __getattr__(name: str):
+    # `uvicorn main:app` builds the app on first access (as does
+    # `uvicorn main:create_app --factory`); importing main alone has no side effects
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(create_app(), host="0.0.0.0", port=8000)
@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import date, time, datetime
 from typing import Optional, List
+import asyncio
+import csv
+import io
+import json
 from .auth import get_current_user
-from supabase import create_client, Client
-import os
+from services.availability import availability
+from services.db import DatabaseError, db
+from services.notifications import notifications
+from services.pagination import InvalidCursor, after, decode_cursor, encode_cursor
+from services.queue_hub import queue_hub
+from services.reservations import UNIQUE_VIOLATION, SlotUnavailable, reservations
 
 router = APIRouter()
 
-# Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
-
 class AppointmentCreate(BaseModel):
     patient_id: str
     doctor_id: str
@@ -29,20 +32,31 @@ class AppointmentUpdate(BaseModel):
     prescriptions: Optional[dict] = None
     notes: Optional[str] = None
 
-@router.get("/")
-async def get_appointments(
+class StatusTransition(BaseModel):
+    id: str
+    status: str
+
+# Mirrors the CHECK constraint on appointments.status
+APPOINTMENT_STATUSES = ("scheduled", "confirmed", "in_progress", "completed", "cancelled", "no_show")
+
+# Keyset order for listing; id breaks ties between same-slot rows
+PAGE_ORDER = ("appointment_date", "appointment_time", "id")
+MAX_PAGE_SIZE = 200
+
+def scoped_appointments_query(
+    current_user: dict,
+    columns: str,
     date_filter: Optional[date] = None,
     doctor_id: Optional[str] = None,
     patient_id: Optional[str] = None,
-    status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    status: Optional[str] = None
 ):
-    """Get appointments with optional filters"""
+    """Appointments query limited to the user's clinic and, for doctors/patients, their own rows"""
     
     clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
     
-    query = supabase.table("appointments")\
-        .select("*, patients(*), doctors(*)")\
+    query = db.table("appointments")\
+        .select(columns)\
         .eq("clinic_id", clinic_id)
     
     if date_filter:
@@ -60,29 +74,141 @@ async def get_appointments(
     # Role-based filtering
     if current_user["role"] == "doctor":
         # Doctors can only see their own appointments
-        doctor_result = supabase.table("doctors")\
-            .select("id")\
-            .eq("user_id", current_user["id"])\
-            .execute()
-        
-        if doctor_result.data:
-            query = query.eq("doctor_id", doctor_result.data[0]["id"])
+        if current_user.get("doctor_id"):
+            query = query.eq("doctor_id", current_user["doctor_id"])
     
     elif current_user["role"] == "patient":
         # Patients can only see their own appointments
-        patient_result = supabase.table("patients")\
-            .select("id")\
-            .eq("user_id", current_user["id"])\
-            .execute()
-        
-        if patient_result.data:
-            query = query.eq("patient_id", patient_result.data[0]["id"])
+        if current_user.get("patient_id"):
+            query = query.eq("patient_id", current_user["patient_id"])
     
-    result = query.order("appointment_date", desc=False)\
-        .order("appointment_time", desc=False)\
-        .execute()
+    for column in PAGE_ORDER:
+        query = query.order(column, desc=False)
+    
+    return query
+
+@router.get("/")
+async def get_appointments(
+    date_filter: Optional[date] = None,
+    doctor_id: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get appointments with optional filters, one keyset page at a time"""
+    
+    query = scoped_appointments_query(
+        current_user, "*, patients(*), doctors(*)", date_filter, doctor_id, patient_id, status
+    )
     
-    return {"appointments": result.data}
+    if cursor:
+        try:
+            query = query.or_(*after(PAGE_ORDER, decode_cursor(cursor, PAGE_ORDER)))
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # One extra row tells us whether another page exists
+    result = await query.limit(limit + 1).execute()
+    appointments = result.data[:limit]
+    next_cursor = encode_cursor(appointments[-1], PAGE_ORDER) if len(result.data) > limit else None
+    
+    return {"appointments": appointments, "next_cursor": next_cursor}
+
+# Columns written by the export endpoint, in CSV column order
+EXPORT_COLUMNS = (
+    "id", "clinic_id", "doctor_id", "patient_id", "appointment_date", "appointment_time",
+    "duration_minutes", "status", "token_number", "consultation_fee", "chief_complaint",
+    "diagnosis", "treatment_plan", "notes", "created_at", "updated_at"
+)
+EXPORT_CHUNK_SIZE = 500
+
+async def _export_chunks(query_factory):
+    """Yield lists of rows, fetched one keyset page at a time"""
+    cursor_values = None
+    while True:
+        query = query_factory()
+        if cursor_values is not None:
+            query = query.or_(*after(PAGE_ORDER, cursor_values))
+        result = await query.limit(EXPORT_CHUNK_SIZE).execute()
+        if not result.data:
+            return
+        yield result.data
+        if len(result.data) < EXPORT_CHUNK_SIZE:
+            return
+        cursor_values = [result.data[-1][column] for column in PAGE_ORDER]
+
+async def _ndjson_rows(query_factory):
+    async for rows in _export_chunks(query_factory):
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+async def _csv_rows(query_factory):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in _export_chunks(query_factory):
+        for row in rows:
+            writer.writerow(["" if row.get(column) is None else row[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+@router.get("/export")
+async def export_appointments(
+    start_date: date,
+    end_date: date,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    doctor_id: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream appointments in a date range as NDJSON or CSV"""
+    
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    def query_factory():
+        return scoped_appointments_query(
+            current_user, ", ".join(EXPORT_COLUMNS), None, doctor_id, patient_id, status
+        )\
+            .gte("appointment_date", start_date.isoformat())\
+            .lte("appointment_date", end_date.isoformat())
+    
+    filename = f"appointments-{start_date.isoformat()}-{end_date.isoformat()}.{export_format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    if export_format == "csv":
+        return StreamingResponse(_csv_rows(query_factory), media_type="text/csv", headers=headers)
+    return StreamingResponse(_ndjson_rows(query_factory), media_type="application/x-ndjson", headers=headers)
+
+@router.get("/availability")
+async def get_availability(
+    doctor_id: Optional[str] = None,
+    speciality: Optional[str] = None,
+    from_date: Optional[date] = None,
+    days: int = Query(7, ge=1, le=31),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Next free slots in the clinic, optionally for one doctor or speciality"""
+    
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    
+    # Served from the in-memory availability index; no per-slot queries
+    slots = await availability.next_free(
+        clinic_id,
+        from_date or date.today(),
+        days=days,
+        limit=limit,
+        doctor_id=doctor_id,
+        speciality=speciality
+    )
+    
+    return {"slots": slots}
 
 @router.post("/")
 async def create_appointment(
@@ -93,96 +219,293 @@ async def create_appointment(
     
     clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
     
-    # Check if slot is available
-    existing_appointment = supabase.table("appointments")\
-        .select("id")\
-        .eq("doctor_id", appointment.doctor_id)\
-        .eq("appointment_date", appointment.appointment_date.isoformat())\
-        .eq("appointment_time", appointment.appointment_time.isoformat())\
-        .eq("status", "scheduled")\
-        .execute()
-    
-    if existing_appointment.data:
-        raise HTTPException(status_code=400, detail="Time slot not available")
-    
-    # Generate token number
-    appointments_today = supabase.table("appointments")\
-        .select("token_number")\
-        .eq("doctor_id", appointment.doctor_id)\
-        .eq("appointment_date", appointment.appointment_date.isoformat())\
-        .execute()
-    
-    token_number = len(appointments_today.data) + 1 if appointments_today.data else 1
-    
     # Create appointment
     appointment_data = {
         **appointment.dict(),
-        "clinic_id": clinic_id,
-        "token_number": token_number,
-        "status": "scheduled"
+        "clinic_id": clinic_id
     }
     
     # Convert date and time to strings for Supabase
     appointment_data["appointment_date"] = appointment.appointment_date.isoformat()
     appointment_data["appointment_time"] = appointment.appointment_time.isoformat()
     
-    result = supabase.table("appointments").insert(appointment_data).execute()
+    # Slot check and token assignment happen in memory; the booking is one insert
+    try:
+        created = await reservations.book(appointment_data)
+    except SlotUnavailable:
+        raise HTTPException(status_code=409, detail="Time slot not available")
     
-    if not result.data:
-        raise HTTPException(status_code=400, detail="Failed to create appointment")
+    await queue_hub.publish(created)
     
-    # TODO: Send WhatsApp confirmation
-    # await send_whatsapp_confirmation(appointment.patient_id, result.data[0])
+    # WhatsApp confirmation is sent by the notification workers, not on this request
+    notifications.enqueue("appointment_confirmation", created)
     
-    return {"appointment": result.data[0], "message": "Appointment created successfully"}
+    return {"appointment": created, "message": "Appointment created successfully"}
 
-@router.patch("/{appointment_id}")
-async def update_appointment(
-    appointment_id: str,
-    appointment_update: AppointmentUpdate,
+MAX_BULK_APPOINTMENTS = 500
+
+@router.post("/bulk")
+async def create_appointments_bulk(
+    appointments: List[AppointmentCreate],
     current_user: dict = Depends(get_current_user)
 ):
-    """Update appointment details"""
+    """Create many appointments at once, reporting the outcome of each"""
     
-    # Check if appointment exists and user has permission
-    appointment_result = supabase.table("appointments")\
-        .select("*")\
-        .eq("id", appointment_id)\
-        .execute()
+    if not appointments:
+        raise HTTPException(status_code=400, detail="No appointments given")
+    if len(appointments) > MAX_BULK_APPOINTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_APPOINTMENTS} appointments per request")
     
-    if not appointment_result.data:
-        raise HTTPException(status_code=404, detail="Appointment not found")
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    
+    batch = [
+        {
+            **appointment.dict(),
+            "clinic_id": clinic_id,
+            "appointment_date": appointment.appointment_date.isoformat(),
+            "appointment_time": appointment.appointment_time.isoformat()
+        }
+        for appointment in appointments
+    ]
+    
+    # One range query for every doctor-day in the batch, then one insert
+    try:
+        booked = await reservations.book_many(batch)
+    except SlotUnavailable:
+        raise HTTPException(status_code=409, detail="Schedule changed during import, please retry")
+    
+    results = []
+    for index, created in enumerate(booked):
+        if created is None:
+            results.append({"index": index, "status": "conflict", "detail": "Time slot not available"})
+            continue
+        await queue_hub.publish(created)
+        notifications.enqueue("appointment_confirmation", created)
+        results.append({"index": index, "status": "created", "appointment": created})
+    
+    created_count = sum(1 for result in results if result["status"] == "created")
+    return {
+        "results": results,
+        "created": created_count,
+        "conflicts": len(results) - created_count
+    }
+
+@router.post("/transitions")
+async def transition_appointments(
+    transitions: List[StatusTransition],
+    current_user: dict = Depends(get_current_user)
+):
+    """Move many appointments to new statuses, reporting the outcome of each"""
     
-    appointment = appointment_result.data[0]
+    if not transitions:
+        raise HTTPException(status_code=400, detail="No transitions given")
+    if len(transitions) > MAX_BULK_APPOINTMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_APPOINTMENTS} transitions per request")
     
-    # Permission check
-    if current_user["role"] == "doctor":
-        doctor_result = supabase.table("doctors")\
-            .select("id")\
-            .eq("user_id", current_user["id"])\
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    
+    # Permission check for the whole set in one query
+    ids = list(dict.fromkeys(transition.id for transition in transitions))
+    existing = await db.table("appointments")\
+        .select("id, doctor_id, patient_id")\
+        .in_("id", ids)\
+        .eq("clinic_id", clinic_id)\
+        .execute()
+    appointments = {appointment["id"]: appointment for appointment in existing.data}
+    
+    outcomes = {}
+    targets = {}
+    for transition in transitions:
+        appointment = appointments.get(transition.id)
+        if transition.id in outcomes or transition.id in targets:
+            outcomes[transition.id] = {"status": "error", "detail": "Appointment listed more than once"}
+            targets.pop(transition.id, None)
+        elif transition.status not in APPOINTMENT_STATUSES:
+            outcomes[transition.id] = {"status": "error", "detail": f"Invalid status: {transition.status}"}
+        elif appointment is None:
+            outcomes[transition.id] = {"status": "error", "detail": "Appointment not found"}
+        elif current_user["role"] == "doctor" and current_user.get("doctor_id") != appointment["doctor_id"]:
+            outcomes[transition.id] = {"status": "error", "detail": "Not authorized to update this appointment"}
+        elif current_user["role"] == "patient" and current_user.get("patient_id") != appointment["patient_id"]:
+            outcomes[transition.id] = {"status": "error", "detail": "Not authorized to update this appointment"}
+        else:
+            targets[transition.id] = transition.status
+    
+    # One filtered update per target status (typically completed and no_show)
+    by_status = {}
+    for appointment_id, status in targets.items():
+        by_status.setdefault(status, []).append(appointment_id)
+    
+    async def apply(status, status_ids):
+        result = await db.table("appointments")\
+            .update({"status": status})\
+            .in_("id", status_ids)\
+            .eq("clinic_id", clinic_id)\
             .execute()
-        
-        if not doctor_result.data or doctor_result.data[0]["id"] != appointment["doctor_id"]:
+        return result.data
+    
+    for status, status_ids in by_status.items():
+        try:
+            updated_rows = await apply(status, status_ids)
+        except DatabaseError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+            # Reactivating a cancelled row whose slot was rebooked fails the whole
+            # statement; redo this status row by row to find the conflicting ones
+            updated_rows = []
+            for appointment_id in status_ids:
+                try:
+                    updated_rows += await apply(status, [appointment_id])
+                except DatabaseError as e:
+                    if e.code != UNIQUE_VIOLATION:
+                        raise
+                    outcomes[appointment_id] = {"status": "conflict", "detail": "Time slot not available"}
+        for updated in updated_rows:
+            reservations.observe(updated)
+            await queue_hub.publish(updated)
+            outcomes[updated["id"]] = {"status": "updated", "appointment": updated}
+        for appointment_id in status_ids:
+            outcomes.setdefault(appointment_id, {"status": "error", "detail": "Appointment not found"})
+    
+    results = [{"id": appointment_id, **outcomes[appointment_id]} for appointment_id in ids]
+    updated_count = sum(1 for result in results if result["status"] == "updated")
+    return {
+        "results": results,
+        "updated": updated_count,
+        "failed": len(results) - updated_count
+    }
+
+def appointment_etag(appointment: dict) -> str:
+    return f'"{appointment.get("version", 1)}"'
+
+def parse_if_match(header: Optional[str]) -> Optional[List[int]]:
+    """Row versions named by an If-Match header; None when absent or "*" """
+    if header is None or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        try:
+            versions.append(int(tag.strip('"')))
+        except ValueError:
+            continue
+    return versions
+
+def permitted_appointment(query, appointment_id: str, current_user: dict):
+    """Limit a query to one appointment the user may change"""
+    
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    query = query.eq("id", appointment_id).eq("clinic_id", clinic_id)
+    
+    if current_user["role"] == "doctor":
+        if not current_user.get("doctor_id"):
             raise HTTPException(status_code=403, detail="Not authorized to update this appointment")
+        query = query.eq("doctor_id", current_user["doctor_id"])
     
     elif current_user["role"] == "patient":
-        patient_result = supabase.table("patients")\
-            .select("id")\
-            .eq("user_id", current_user["id"])\
-            .execute()
-        
-        if not patient_result.data or patient_result.data[0]["id"] != appointment["patient_id"]:
+        if not current_user.get("patient_id"):
             raise HTTPException(status_code=403, detail="Not authorized to update this appointment")
+        query = query.eq("patient_id", current_user["patient_id"])
     
-    # Update appointment
-    update_data = {k: v for k, v in appointment_update.dict().items() if v is not None}
+    return query
+
+async def _update_failure(appointment_id: str, current_user: dict, versions: Optional[List[int]]) -> HTTPException:
+    """Work out why a conditional update matched no row"""
     
-    result = supabase.table("appointments")\
-        .update(update_data)\
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    result = await db.table("appointments")\
+        .select("id, doctor_id, patient_id, version")\
         .eq("id", appointment_id)\
+        .eq("clinic_id", clinic_id)\
         .execute()
     
-    return {"appointment": result.data[0], "message": "Appointment updated successfully"}
+    if not result.data:
+        return HTTPException(status_code=404, detail="Appointment not found")
+    
+    appointment = result.data[0]
+    
+    if current_user["role"] == "doctor":
+        if not current_user.get("doctor_id") or current_user["doctor_id"] != appointment["doctor_id"]:
+            return HTTPException(status_code=403, detail="Not authorized to update this appointment")
+    
+    elif current_user["role"] == "patient":
+        if not current_user.get("patient_id") or current_user["patient_id"] != appointment["patient_id"]:
+            return HTTPException(status_code=403, detail="Not authorized to update this appointment")
+    
+    if versions is not None and appointment["version"] not in versions:
+        return HTTPException(
+            status_code=412,
+            detail="Appointment was changed by someone else; reload it and try again",
+            headers={"ETag": appointment_etag(appointment)}
+        )
+    
+    # The row changed between the update and this lookup
+    return HTTPException(status_code=409, detail="Appointment was changed concurrently, please retry")
+
+@router.get("/{appointment_id}")
+async def get_appointment(
+    appointment_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get one appointment with its ETag for conditional updates"""
+    
+    result = await scoped_appointments_query(current_user, "*, patients(*), doctors(*)")\
+        .eq("id", appointment_id)\
+        .execute()
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    
+    appointment = result.data[0]
+    etag = appointment_etag(appointment)
+    
+    if if_none_match and etag in [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return {"appointment": appointment}
+
+@router.patch("/{appointment_id}")
+async def update_appointment(
+    appointment_id: str,
+    appointment_update: AppointmentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Update appointment details; with If-Match, only if nobody changed it since"""
+    
+    update_data = {k: v for k, v in appointment_update.dict().items() if v is not None}
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    # Permission predicate and expected version are part of the UPDATE, so the
+    # common case is a single round trip; the row is only read when it fails
+    versions = parse_if_match(if_match)
+    query = permitted_appointment(db.table("appointments").update(update_data), appointment_id, current_user)
+    if versions is not None:
+        query = query.in_("version", versions)
+    
+    try:
+        result = await query.execute() if versions != [] else None
+    except DatabaseError as e:
+        if e.code != UNIQUE_VIOLATION:
+            raise
+        # Reactivating a cancelled appointment whose slot was rebooked
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    if result is None or not result.data:
+        raise await _update_failure(appointment_id, current_user, versions)
+    
+    updated = result.data[0]
+    reservations.observe(updated)
+    await queue_hub.publish(updated)
+    
+    response.headers["ETag"] = appointment_etag(updated)
+    return {"appointment": updated, "message": "Appointment updated successfully"}
 
 @router.delete("/{appointment_id}")
 async def cancel_appointment(
@@ -191,7 +514,7 @@ async def cancel_appointment(
 ):
     """Cancel an appointment"""
     
-    result = supabase.table("appointments")\
+    result = await db.table("appointments")\
         .update({"status": "cancelled"})\
         .eq("id", appointment_id)\
         .execute()
@@ -199,6 +522,9 @@ async def cancel_appointment(
     if not result.data:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
+    reservations.observe(result.data[0])
+    await queue_hub.publish(result.data[0])
+    
     return {"message": "Appointment cancelled successfully"}
 
 @router.get("/queue/{doctor_id}")
@@ -212,7 +538,7 @@ async def get_doctor_queue(
     if not date_filter:
         date_filter = datetime.now().date()
     
-    appointments = supabase.table("appointments")\
+    appointments = await db.table("appointments")\
         .select("*, patients(*)")\
         .eq("doctor_id", doctor_id)\
         .eq("appointment_date", date_filter.isoformat())\
@@ -220,4 +546,52 @@ async def get_doctor_queue(
         .order("appointment_time")\
         .execute()
     
-    return {"queue": appointments.data, "date": date_filter}
\ No newline at end of file
+    return {"queue": appointments.data, "date": date_filter}
+
+# Comment line sent on idle SSE streams so proxies keep them open
+SSE_HEARTBEAT_SECONDS = 15
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/queue/{doctor_id}/stream")
+async def stream_doctor_queue(
+    doctor_id: str,
+    request: Request,
+    date_filter: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Server-sent events: the doctor's queue once, then only changes"""
+    
+    # The stream carries patient details; only the doctor's own clinic may watch it
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    doctor = await db.table("doctors")\
+        .select("id")\
+        .eq("id", doctor_id)\
+        .eq("clinic_id", clinic_id)\
+        .execute()
+    if not doctor.data:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    
+    day = (date_filter or datetime.now().date()).isoformat()
+    snapshot, mailbox = await queue_hub.subscribe(doctor_id, day)
+    
+    async def events():
+        try:
+            yield _sse("snapshot", {"queue": snapshot, "date": day})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(mailbox.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                # Every subscriber's mailbox holds the same event dict
+                yield _sse(event["type"], {key: value for key, value in event.items() if key != "type"})
+        finally:
+            queue_hub.unsubscribe(doctor_id, day, mailbox)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
@@ -1,23 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-import jwt
 from datetime import datetime, timedelta
+import math
+import uuid
 from passlib.context import CryptContext
-from supabase import create_client, Client
-import os
+from services.admission import AdmissionRejected, auth_gate
+from services.db import db
+from services.keyring import key_ring
+from services.principal_cache import principal_cache
+from services.revocation import revocations
 
 router = APIRouter()
 security = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
-
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -34,59 +32,94 @@ class TokenResponse(BaseModel):
     token_type: str
     user: dict
 
+# users row plus the doctor/patient rows that reference it, in one round trip
+PRINCIPAL_COLUMNS = "*, doctors(id), patients(id)"
+
+def build_principal(row: dict) -> dict:
+    """Flatten the embedded domain identities onto the users row"""
+    principal = dict(row)
+    doctors = principal.pop("doctors", None) or []
+    patients = principal.pop("patients", None) or []
+    principal["doctor_id"] = doctors[0]["id"] if doctors else None
+    principal["patient_id"] = patients[0]["id"] if patients else None
+    principal["clinic_id"] = row.get("clinic_id") or row.get("hospital_id")
+    return principal
+
+def verify_token(token: str) -> Optional[dict]:
+    """Claims of a valid, unexpired and unrevoked token, or None; never does I/O"""
+    claims = key_ring.verify(token)
+    if claims is None or revocations.is_revoked(claims.get("jti")):
+        return None
+    return claims
+
+def decode_token_subject(token: str) -> Optional[str]:
+    """Verify a bearer token and return its subject, or None if it is invalid"""
+    claims = verify_token(token)
+    return claims.get("sub") if claims else None
+
+def cached_principal(token: str) -> Optional[dict]:
+    """Principal for a valid token if it is already cached; never touches the database"""
+    user_id = decode_token_subject(token)
+    return principal_cache.peek(user_id) if user_id else None
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(
-            credentials.credentials,
-            os.getenv("JWT_SECRET_KEY"),
-            algorithms=[os.getenv("JWT_ALGORITHM", "HS256")]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials"
-            )
-        
-        # Get user from database
-        result = supabase.table("users").select("*").eq("auth_user_id", user_id).execute()
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-        
-        return result.data[0]
-    except jwt.PyJWTError:
+    user_id = decode_token_subject(credentials.credentials)
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
+    
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    # Get user and their doctor/patient identity from database
+    result = await db.table("users").select(PRINCIPAL_COLUMNS).eq("auth_user_id", user_id).execute()
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    principal = build_principal(result.data[0])
+    principal_cache.set(user_id, principal)
+    return principal
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=int(os.getenv("JWT_EXPIRE_MINUTES", 60)))
+    expire = datetime.utcnow() + (expires_delta or key_ring.token_lifetime)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode,
-        os.getenv("JWT_SECRET_KEY"),
-        algorithm=os.getenv("JWT_ALGORITHM", "HS256")
+    # jti identifies the token for revocation on logout
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
+    return key_ring.sign(to_encode)
+
+def _admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=e.reason,
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
     )
-    return encoded_jwt
 
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, http_request: Request):
+    # Authenticate with Supabase on the bounded auth pool, off the event loop
+    try:
+        auth_response = await auth_gate.run(
+            db.auth.sign_in_with_password,
+            {"email": request.email, "password": request.password},
+            email=request.email,
+            ip=http_request.client.host if http_request.client else None
+        )
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication failed"
+        )
+    
     try:
-        # Authenticate with Supabase
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": request.email,
-            "password": request.password
-        })
-        
         if not auth_response.user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -94,7 +127,7 @@ async def login(request: LoginRequest):
             )
         
         # Get user profile
-        user_result = supabase.table("users").select("*").eq("auth_user_id", auth_response.user.id).execute()
+        user_result = await db.table("users").select(PRINCIPAL_COLUMNS).eq("auth_user_id", auth_response.user.id).execute()
         
         if not user_result.data:
             raise HTTPException(
@@ -102,7 +135,8 @@ async def login(request: LoginRequest):
                 detail="User profile not found"
             )
         
-        user_profile = user_result.data[0]
+        user_profile = build_principal(user_result.data[0])
+        principal_cache.set(auth_response.user.id, user_profile)
         
         # Create JWT token
         access_token = create_access_token(data={"sub": auth_response.user.id})
@@ -120,14 +154,24 @@ async def login(request: LoginRequest):
         )
 
 @router.post("/register", response_model=TokenResponse)
-async def register(request: RegisterRequest):
+async def register(request: RegisterRequest, http_request: Request):
+    # Create user in Supabase Auth on the bounded auth pool
+    try:
+        auth_response = await auth_gate.run(
+            db.auth.sign_up,
+            {"email": request.email, "password": request.password},
+            email=request.email,
+            ip=http_request.client.host if http_request.client else None
+        )
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Registration failed: {str(e)}"
+        )
+    
     try:
-        # Create user in Supabase Auth
-        auth_response = supabase.auth.sign_up({
-            "email": request.email,
-            "password": request.password
-        })
-        
         if not auth_response.user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -143,7 +187,7 @@ async def register(request: RegisterRequest):
             "phone": request.phone
         }
         
-        profile_result = supabase.table("users").insert(user_profile).execute()
+        profile_result = await db.table("users").insert(user_profile).execute()
         
         if not profile_result.data:
             raise HTTPException(
@@ -151,6 +195,9 @@ async def register(request: RegisterRequest):
                 detail="Failed to create user profile"
             )
         
+        # A profile row now exists for this subject; drop any stale principal
+        principal_cache.invalidate(auth_response.user.id)
+        
         # Create JWT token
         access_token = create_access_token(data={"sub": auth_response.user.id})
         
@@ -170,7 +217,17 @@ async def register(request: RegisterRequest):
 async def get_current_user_profile(current_user: dict = Depends(get_current_user)):
     return current_user
 
+@router.get("/principal-cache")
+async def get_principal_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Principal cache hit/miss counters"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return principal_cache.stats()
+
 @router.post("/logout")
-async def logout():
-    # In a real implementation, you might want to blacklist the token
+async def logout(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+    # Revoke the presented token until it expires; other workers pick it up on their next sync
+    claims = verify_token(credentials.credentials) if credentials else None
+    if claims and claims.get("jti"):
+        await revocations.revoke(claims["jti"], claims["exp"])
     return {"message": "Successfully logged out"}
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import hmac
+from services.instrumentation import registry
+from services.settings import Settings, app_settings
+
+router = APIRouter()
+
+@router.get("/stats", response_class=PlainTextResponse)
+async def get_internal_stats(
+    authorization: Optional[str] = Header(None),
+    settings: Settings = Depends(app_settings)
+):
+    """Request and database histograms in Prometheus text format"""
+    
+    # Scrapers authenticate with a static token; without one the endpoint is off
+    token = settings.internal_stats_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid stats token")
+    
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,26 +1,44 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from typing import Dict, Any
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from datetime import date, datetime
 from .auth import get_current_user
-from supabase import create_client, Client
+from services.db import db
+from services.counters import COUNTER_NAMES, read_clinic_counters
+from services.aggregates import RevenueSummary, revenue_summary
+from services.stock_alerts import stock_alerts
+import asyncio
+import logging
 import os
 
 router = APIRouter()
 
-# Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
+# Per-query deadline for the overview fan-out
+METRIC_TIMEOUT_SECONDS = float(os.getenv("METRICS_QUERY_TIMEOUT_SECONDS", 2))
+
+logger = logging.getLogger(__name__)
+
+# Last successful value of each overview metric per clinic, served as stale
+# when a query fails or misses its deadline
+_last_known_metrics: Dict[str, Dict[str, Any]] = {}
 
 class MetricsResponse(BaseModel):
-    total_appointments: int
-    active_users: int
-    revenue_today: float
-    patients_today: int
-    pending_lab_tests: int
-    low_stock_items: int
+    total_appointments: Optional[int] = None
+    active_users: Optional[int] = None
+    revenue_today: Optional[float] = None
+    patients_today: Optional[int] = None
+    pending_lab_tests: Optional[int] = None
+    low_stock_items: Optional[int] = None
+    stale: List[str] = []
+    missing: List[str] = []
+
+async def _count(query) -> int:
+    result = await query.execute()
+    return result.count or 0
+
+async def _revenue_today(clinic_id: str, today: date) -> float:
+    summary = await revenue_summary(clinic_id, today)
+    return float(summary.total)
 
 @router.get("/overview", response_model=MetricsResponse)
 async def get_overview_metrics(current_user: dict = Depends(get_current_user)):
@@ -29,73 +47,58 @@ async def get_overview_metrics(current_user: dict = Depends(get_current_user)):
     clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
     today = datetime.now().date()
     
-    try:
-        # Total appointments
-        appointments_result = supabase.table("appointments")\
-            .select("id", count="exact")\
-            .eq("clinic_id", clinic_id)\
-            .execute()
-        total_appointments = appointments_result.count or 0
-        
-        # Active users
-        users_result = supabase.table("users")\
-            .select("id", count="exact")\
-            .eq("clinic_id", clinic_id)\
-            .eq("is_active", True)\
-            .execute()
-        active_users = users_result.count or 0
-        
-        # Revenue today
-        revenue_result = supabase.table("accounts_tx")\
-            .select("amount")\
-            .eq("clinic_id", clinic_id)\
-            .eq("transaction_date", today)\
-            .eq("transaction_type", "income")\
-            .execute()
-        revenue_today = sum(float(tx["amount"]) for tx in revenue_result.data) if revenue_result.data else 0.0
-        
-        # Patients today
-        patients_today_result = supabase.table("appointments")\
-            .select("id", count="exact")\
-            .eq("clinic_id", clinic_id)\
-            .eq("appointment_date", today)\
-            .execute()
-        patients_today = patients_today_result.count or 0
-        
-        # Pending lab tests
-        lab_tests_result = supabase.table("lab_tests")\
-            .select("id", count="exact")\
-            .eq("clinic_id", clinic_id)\
-            .in_("status", ["ordered", "collected", "processing"])\
-            .execute()
-        pending_lab_tests = lab_tests_result.count or 0
-        
-        # Low stock items
-        low_stock_result = supabase.table("pharmacy_items")\
-            .select("id", count="exact")\
-            .eq("clinic_id", clinic_id)\
-            .filter("quantity_available", "lte", "reorder_level")\
-            .execute()
-        low_stock_items = low_stock_result.count or 0
-        
-        return MetricsResponse(
-            total_appointments=total_appointments,
-            active_users=active_users,
-            revenue_today=revenue_today,
-            patients_today=patients_today,
-            pending_lab_tests=pending_lab_tests,
-            low_stock_items=low_stock_items
-        )
+    # Independent reads, issued concurrently; each returns one or more metrics
+    queries = {
+        # Precomputed counters, maintained by triggers
+        COUNTER_NAMES: read_clinic_counters(clinic_id, today),
+        ("active_users",): _count(
+            db.table("users")\
+                .select("id", count="exact")\
+                .eq("clinic_id", clinic_id)\
+                .eq("is_active", True)
+        ),
+        # Summed server-side
+        ("revenue_today",): _revenue_today(clinic_id, today),
+    }
+    
+    results = await asyncio.gather(
+        *(asyncio.wait_for(query, METRIC_TIMEOUT_SECONDS) for query in queries.values()),
+        return_exceptions=True
+    )
+    
+    # Return whatever finished; fall back to the last known value, else leave it empty
+    last_known = _last_known_metrics.setdefault(clinic_id, {})
+    metrics: Dict[str, Any] = {"stale": [], "missing": []}
+    for names, result in zip(queries, results):
+        if isinstance(result, BaseException):
+            logger.warning("Overview metrics %s failed for clinic %s: %r", ", ".join(names), clinic_id, result)
+            for name in names:
+                if name in last_known:
+                    metrics[name] = last_known[name]
+                    metrics["stale"].append(name)
+                else:
+                    metrics["missing"].append(name)
+            continue
         
-    except Exception as e:
-        return MetricsResponse(
-            total_appointments=0,
-            active_users=0,
-            revenue_today=0.0,
-            patients_today=0,
-            pending_lab_tests=0,
-            low_stock_items=0
-        )
+        values = result if isinstance(result, dict) else {names[0]: result}
+        metrics.update(values)
+        last_known.update(values)
+    
+    return MetricsResponse(**metrics)
+
+@router.get("/revenue", response_model=RevenueSummary)
+async def get_revenue_summary(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    transaction_type: str = "income",
+    current_user: dict = Depends(get_current_user)
+):
+    """Get revenue totals with category and payment-method breakdown for a period"""
+    
+    clinic_id = current_user.get("clinic_id") or current_user.get("hospital_id")
+    start_date = start_date or datetime.now().date()
+    
+    return await revenue_summary(clinic_id, start_date, end_date or start_date, transaction_type)
 
 @router.get("/dashboard/{role}")
 async def get_role_specific_metrics(role: str, current_user: dict = Depends(get_current_user)):
@@ -106,16 +109,11 @@ async def get_role_specific_metrics(role: str, current_user: dict = Depends(get_
     
     if role == "doctor":
         # Doctor-specific metrics
-        doctor_result = supabase.table("doctors")\
-            .select("id")\
-            .eq("user_id", current_user["id"])\
-            .execute()
+        doctor_id = current_user.get("doctor_id")
         
-        if doctor_result.data:
-            doctor_id = doctor_result.data[0]["id"]
-            
+        if doctor_id:
             # Today's appointments
-            appointments_today = supabase.table("appointments")\
+            appointments_today = await db.table("appointments")\
                 .select("*")\
                 .eq("doctor_id", doctor_id)\
                 .eq("appointment_date", today)\
@@ -130,7 +128,7 @@ async def get_role_specific_metrics(role: str, current_user: dict = Depends(get_
     
     elif role == "receptionist":
         # Reception-specific metrics
-        appointments_today = supabase.table("appointments")\
+        appointments_today = await db.table("appointments")\
             .select("*, patients(*), doctors(*)")\
             .eq("clinic_id", clinic_id)\
             .eq("appointment_date", today)\
@@ -144,23 +142,13 @@ async def get_role_specific_metrics(role: str, current_user: dict = Depends(get_
         }
     
     elif role == "pharmacist":
-        # Pharmacy-specific metrics
-        low_stock = supabase.table("pharmacy_items")\
-            .select("*")\
-            .eq("clinic_id", clinic_id)\
-            .filter("quantity_available", "lte", "reorder_level")\
-            .execute()
-        
-        expiring_soon = supabase.table("pharmacy_items")\
-            .select("*")\
-            .eq("clinic_id", clinic_id)\
-            .filter("expiry_date", "lte", (today + timedelta(days=60)).isoformat())\
-            .execute()
+        # Low-stock and expiring items from one indexed query, cached per clinic
+        alerts = await stock_alerts.alerts(clinic_id, today)
         
         return {
-            "low_stock_items": low_stock.data,
-            "expiring_items": expiring_soon.data,
-            "alerts_count": len(low_stock.data) + len(expiring_soon.data)
+            "low_stock_items": alerts.low_stock_items,
+            "expiring_items": alerts.expiring_items,
+            "alerts_count": len(alerts.low_stock_items) + len(alerts.expiring_items)
         }
     
     return {"message": "Role-specific metrics not implemented yet"}
\ No newline at end of file
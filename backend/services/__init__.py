@@ -0,0 +1,3 @@
+"""
+Shared backend services (data access, caches, background workers)
+"""
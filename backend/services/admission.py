@@ -0,0 +1,128 @@
+"""
+Admission control for blocking upstream auth calls
+
+The supabase-py GoTrue client is synchronous, so sign-in and sign-up run on a
+small dedicated thread pool instead of the event loop. ``AuthGate`` caps how
+many calls may wait for that pool and rejects the rest immediately, and
+throttles attempts per email and per client IP with a sliding window, so a
+login storm degrades into fast 429s instead of stalling appointment and queue
+traffic.
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional
+import asyncio
+import contextvars
+import functools
+import os
+import time
+
+
+class AdmissionRejected(Exception):
+    """The call was not admitted; retry after ``retry_after`` seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SlidingWindowThrottle:
+    """At most ``limit`` attempts per key within ``window_seconds``"""
+
+    def __init__(self, limit: int, window_seconds: float = 60.0, max_keys: int = 100000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._attempts: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def retry_after(self, key: str, now: float) -> Optional[float]:
+        """Seconds until ``key`` may try again, or None if it may try now"""
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window_seconds:
+            attempts.popleft()
+        if len(attempts) < self.limit:
+            return None
+        return attempts[0] + self.window_seconds - now
+
+    def record(self, key: str, now: float):
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = self._attempts[key] = deque()
+        attempts.append(now)
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+
+
+class AuthGate:
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_queue: int = 32,
+        email_attempts_per_minute: int = 10,
+        ip_attempts_per_minute: int = 60,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.by_email = SlidingWindowThrottle(email_attempts_per_minute)
+        # Front desks share an address, so the per-IP allowance is larger
+        self.by_ip = SlidingWindowThrottle(ip_attempts_per_minute)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, email: str, ip: Optional[str] = None) -> Any:
+        """Run a blocking auth call on the pool; raises AdmissionRejected"""
+        now = time.monotonic()
+        email = email.lower()
+        for throttle, key in ((self.by_email, email), (self.by_ip, ip)):
+            if key is None:
+                continue
+            wait = throttle.retry_after(key, now)
+            if wait is not None:
+                raise AdmissionRejected("Too many attempts", wait)
+
+        # Running plus waiting calls; beyond this a caller would only time out
+        if self._pending >= self.max_workers + self.max_queue:
+            raise AdmissionRejected("Authentication service busy", 1.0)
+
+        self.by_email.record(email, now)
+        if ip is not None:
+            self.by_ip.record(ip, now)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="auth")
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        self._pending += 1
+        future = self._executor.submit(call)
+        # Released when the pool is done with the call, not when the caller
+        # stops waiting: a cancelled caller's call may still hold a thread
+        future.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            # The loop is already closed; nothing is left to admit
+            pass
+
+    def _decrement(self):
+        self._pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+auth_gate = AuthGate(
+    max_workers=int(os.getenv("AUTH_MAX_WORKERS", 8)),
+    max_queue=int(os.getenv("AUTH_MAX_QUEUE", 32)),
+    email_attempts_per_minute=int(os.getenv("AUTH_EMAIL_ATTEMPTS_PER_MINUTE", 10)),
+    ip_attempts_per_minute=int(os.getenv("AUTH_IP_ATTEMPTS_PER_MINUTE", 60)),
+)
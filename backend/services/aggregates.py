@@ -0,0 +1,51 @@
+"""
+Server-side aggregate queries
+
+Sums are computed in Postgres and returned as text, then parsed into Decimal,
+so money never goes through float accumulation.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from .db import db
+
+
+class RevenueSummary(BaseModel):
+    start_date: date
+    end_date: date
+    transaction_type: str
+    total: Decimal
+    count: int
+    by_category: Dict[str, Decimal]
+    by_payment_method: Dict[str, Decimal]
+
+
+async def revenue_summary(
+    clinic_id: str,
+    start_date: date,
+    end_date: Optional[date] = None,
+    transaction_type: str = "income",
+) -> RevenueSummary:
+    """Totals for ``accounts_tx`` rows of one clinic between two dates (inclusive)"""
+    end_date = end_date or start_date
+    result = await db.rpc("revenue_summary", {
+        "p_clinic_id": clinic_id,
+        "p_from": start_date.isoformat(),
+        "p_to": end_date.isoformat(),
+        "p_transaction_type": transaction_type,
+    }, reads=("accounts_tx",)).execute()
+
+    summary = result.data or {}
+    return RevenueSummary(
+        start_date=start_date,
+        end_date=end_date,
+        transaction_type=transaction_type,
+        total=Decimal(summary.get("total") or "0"),
+        count=int(summary.get("count") or 0),
+        by_category={k: Decimal(v) for k, v in (summary.get("by_category") or {}).items()},
+        by_payment_method={k: Decimal(v) for k, v in (summary.get("by_payment_method") or {}).items()},
+    )
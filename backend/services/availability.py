@@ -0,0 +1,212 @@
+"""
+Free-slot search over doctors' working hours
+
+For each clinic the index keeps its active doctors' hours and, per day, the
+start times of booked appointments per doctor as sorted minute offsets. A
+clinic's doctors load with one query and any missing days of a search window
+with one range query; after that a search is pure in-memory interval checks.
+Bookings, transitions and cancellations made through ``reservations`` are
+folded in as they happen, and loaded data is refreshed after ``ttl_seconds``
+to pick up writes from other workers.
+"""
+
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import asyncio
+import heapq
+import os
+import time
+
+from .db import db
+from .reservations import ACTIVE_STATUSES, reservations
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+class DoctorHours(NamedTuple):
+    id: str
+    name: str
+    speciality: str
+    start: int
+    end: int
+    slot_minutes: int
+    days: frozenset
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "DoctorHours":
+        return cls(
+            row["id"],
+            row.get("name") or "",
+            row.get("speciality") or "",
+            _minutes(row.get("start_time") or "09:00"),
+            _minutes(row.get("end_time") or "17:00"),
+            row.get("slot_duration_minutes") or 30,
+            frozenset(day.lower() for day in row.get("available_days") or WEEKDAYS[:5]),
+        )
+
+
+class ClinicDay:
+    """Booked start minutes per doctor for one clinic and date"""
+
+    def __init__(self, loaded_at: float):
+        self.loaded_at = loaded_at
+        self.appointments: Dict[str, Tuple[str, int]] = {}
+        self.starts: Dict[str, List[int]] = {}
+
+    def observe(self, appointment: Dict[str, Any]):
+        previous = self.appointments.pop(appointment["id"], None)
+        if previous is not None:
+            self.starts[previous[0]].remove(previous[1])
+        if appointment.get("status") in ACTIVE_STATUSES:
+            start = _minutes(appointment["appointment_time"])
+            self.appointments[appointment["id"]] = (appointment["doctor_id"], start)
+            insort(self.starts.setdefault(appointment["doctor_id"], []), start)
+
+    def free_slots(self, doctor: DoctorHours, not_before: int = 0) -> Iterator[int]:
+        """Start minutes of the doctor's slots that overlap no booking"""
+        starts = self.starts.get(doctor.id, [])
+        length = doctor.slot_minutes
+        for start in range(doctor.start, doctor.end - length + 1, length):
+            if start < not_before:
+                continue
+            # A booking made at b occupies [b, b + length)
+            i = bisect_right(starts, start - length)
+            if i < len(starts) and starts[i] < start + length:
+                continue
+            yield start
+
+
+def _ranked(minutes: Iterator[int], rank: int) -> Iterator[Tuple[int, int]]:
+    for minute in minutes:
+        yield minute, rank
+
+
+class AvailabilityIndex:
+    def __init__(self, ttl_seconds: float = 60.0, max_days: int = 2000):
+        self.ttl_seconds = ttl_seconds
+        self.max_days = max_days
+        self._doctors: Dict[str, Tuple[float, List[DoctorHours]]] = {}
+        self._days: "OrderedDict[Tuple[str, str], ClinicDay]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _fresh(self, loaded_at: float, now: float) -> bool:
+        return now - loaded_at < self.ttl_seconds
+
+    async def _ensure(self, clinic_id: str, days: List[str]):
+        """Load the clinic's doctors and any missing or stale days, once per clinic at a time"""
+        lock = self._locks.setdefault(clinic_id, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            entry = self._doctors.get(clinic_id)
+            if entry is None or not self._fresh(entry[0], now):
+                result = await db.table("doctors")\
+                    .select("id, name, speciality, start_time, end_time, slot_duration_minutes, available_days")\
+                    .eq("clinic_id", clinic_id)\
+                    .eq("is_active", True)\
+                    .execute()
+                doctors = sorted((DoctorHours.from_row(row) for row in result.data), key=lambda d: (d.name, d.id))
+                self._doctors[clinic_id] = (now, doctors)
+
+            missing = [
+                day for day in days
+                if (clinic_id, day) not in self._days or not self._fresh(self._days[(clinic_id, day)].loaded_at, now)
+            ]
+            if not missing:
+                return
+            result = await db.table("appointments")\
+                .select("id, doctor_id, appointment_date, appointment_time, status")\
+                .eq("clinic_id", clinic_id)\
+                .gte("appointment_date", missing[0])\
+                .lte("appointment_date", missing[-1])\
+                .in_("status", list(ACTIVE_STATUSES))\
+                .execute()
+            loaded = {day: ClinicDay(now) for day in missing}
+            for appointment in result.data:
+                clinic_day = loaded.get(appointment["appointment_date"])
+                if clinic_day is not None:
+                    clinic_day.observe(appointment)
+            for day, clinic_day in loaded.items():
+                self._days[(clinic_id, day)] = clinic_day
+                self._days.move_to_end((clinic_id, day))
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+
+    async def next_free(
+        self,
+        clinic_id: str,
+        start: date,
+        days: int = 7,
+        limit: int = 10,
+        doctor_id: Optional[str] = None,
+        speciality: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """The first ``limit`` free slots from ``start``, earliest first, over ``days`` days"""
+        now = now or datetime.now()
+        today = now.date().isoformat()
+        start = max(start, now.date())
+        window = [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
+        await self._ensure(clinic_id, window)
+
+        doctors = [
+            doctor for doctor in self._doctors[clinic_id][1]
+            if (doctor_id is None or doctor.id == doctor_id)
+            and (speciality is None or doctor.speciality.lower() == speciality.lower())
+        ]
+        slots: List[Dict[str, Any]] = []
+        for day in window:
+            clinic_day = self._days.get((clinic_id, day))
+            if clinic_day is None:
+                continue
+            weekday = WEEKDAYS[date.fromisoformat(day).weekday()]
+            # Today's slots that have already started are not offered
+            not_before = now.hour * 60 + now.minute if day == today else 0
+            working = [doctor for doctor in doctors if weekday in doctor.days]
+            # Earliest slot across doctors first; ties keep the doctors' name order
+            merged = heapq.merge(*(_ranked(clinic_day.free_slots(doctor, not_before), rank) for rank, doctor in enumerate(working)))
+            for minute, rank in merged:
+                doctor = working[rank]
+                slots.append({
+                    "doctor_id": doctor.id,
+                    "doctor_name": doctor.name,
+                    "speciality": doctor.speciality,
+                    "appointment_date": day,
+                    "appointment_time": _clock(minute),
+                    "duration_minutes": doctor.slot_minutes,
+                })
+                if len(slots) >= limit:
+                    return slots
+        return slots
+
+    def observe(self, appointment: Dict[str, Any]):
+        """Fold a written appointment row into a loaded clinic day"""
+        if not {"id", "clinic_id", "doctor_id", "appointment_date", "appointment_time"} <= appointment.keys():
+            return
+        clinic_day = self._days.get((appointment["clinic_id"], appointment["appointment_date"]))
+        if clinic_day is not None:
+            clinic_day.observe(appointment)
+
+    def forget(self, clinic_id: Optional[str] = None):
+        """Drop cached doctors and days (all, or one clinic's) so they reload on next use"""
+        for key in [k for k in self._doctors if clinic_id is None or k == clinic_id]:
+            del self._doctors[key]
+        for key in [k for k in self._days if clinic_id is None or k[0] == clinic_id]:
+            del self._days[key]
+
+
+availability = AvailabilityIndex(
+    ttl_seconds=float(os.getenv("AVAILABILITY_TTL_SECONDS", 60)),
+    max_days=int(os.getenv("AVAILABILITY_CACHE_DAYS", 2000)),
+)
+reservations.add_listener(availability.observe)
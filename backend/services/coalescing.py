@@ -0,0 +1,142 @@
+"""
+Single-flight coalescing of identical reads
+
+Dashboards and queue screens in the same clinic refresh together and issue
+the same select at the same moment. ``ReadCoalescer`` lets concurrent
+identical reads (same table, filters, projection, ordering and page, or the
+same read-only RPC and arguments) share one upstream call: the first caller starts it and later callers wait for its
+result. With ``reuse_seconds`` > 0 a finished result is also served to
+identical reads for that long.
+
+Every caller gets its own copy of the rows, so routers may keep mutating
+results in place. Writes made through this process drop the in-flight and
+reused entries for the tables they touch; writes from other workers are only
+seen once the reuse window has passed, so keep it short.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+import asyncio
+import re
+import time
+
+# Embedded resources in a projection, e.g. "*, patients(*), doctor:doctors!inner(name)"
+_EMBEDDED = re.compile(r"(\w+)(?:!\w+)?\s*\(")
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def clone(value: Any) -> Any:
+    """Copy of JSON-shaped data; much cheaper than copy.deepcopy"""
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(clone(v) for v in value)
+    return value
+
+
+def tables_read(table: str, columns: str) -> FrozenSet[str]:
+    """The table and every table embedded in the projection"""
+    return frozenset((table, *_EMBEDDED.findall(columns)))
+
+
+@dataclass
+class _Flight:
+    tables: FrozenSet[str]
+    task: Optional["asyncio.Future"] = None
+    waiters: int = 1
+    invalidated: bool = False
+    results: List[Any] = field(default_factory=list)
+
+
+class ReadCoalescer:
+    def __init__(self, reuse_seconds: float = 0.0, max_entries: int = 1024):
+        self.reuse_seconds = reuse_seconds
+        self.max_entries = max_entries
+        self._flights: Dict[Hashable, _Flight] = {}
+        # key -> (expires_at, tables, result)
+        self._reuse: Dict[Hashable, Tuple[float, FrozenSet[str], Any]] = {}
+        self.upstream = 0
+        self.joined = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(
+        table: str, columns: str, filters: Any, orders: Any, limit: Optional[int], offset: Optional[int], count: Optional[str],
+        params: Any = None,
+    ) -> Hashable:
+        return (table, columns, _freeze(filters), _freeze(orders), limit, offset, count, _freeze(params))
+
+    async def run(self, key: Hashable, tables: FrozenSet[str], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of ``fetch()``, shared with identical concurrent (or recent) calls"""
+        if self.reuse_seconds > 0:
+            entry = self._reuse.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.reused += 1
+                    return clone(entry[2])
+                del self._reuse[key]
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.joined += 1
+        else:
+            self.upstream += 1
+            flight = _Flight(tables)
+            self._flights[key] = flight
+            # The upstream call runs on its own task, so a caller that is
+            # cancelled (client went away) does not fail the others
+            flight.task = asyncio.ensure_future(self._fly(key, flight, fetch))
+
+        try:
+            await asyncio.shield(flight.task)
+        finally:
+            # A caller cancelled before the result exists needs no copy of it
+            flight.waiters -= 1
+        return flight.results.pop()
+
+    async def _fly(self, key: Hashable, flight: _Flight, fetch: Callable[[], Awaitable[Any]]):
+        try:
+            result = await fetch()
+        finally:
+            # No caller can join once the result exists
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        # One copy per waiter, made before any of them resumes
+        flight.results = [result] + [clone(result) for _ in range(flight.waiters - 1)]
+        if self.reuse_seconds > 0 and not flight.invalidated:
+            self._remember(key, flight.tables, clone(result))
+
+    def _remember(self, key: Hashable, tables: FrozenSet[str], result: Any):
+        now = time.monotonic()
+        if len(self._reuse) >= self.max_entries:
+            for stale in [k for k, (expires_at, _, _) in self._reuse.items() if expires_at <= now]:
+                del self._reuse[stale]
+            while len(self._reuse) >= self.max_entries:
+                del self._reuse[next(iter(self._reuse))]
+        self._reuse[key] = (now + self.reuse_seconds, tables, result)
+
+    def invalidate(self, table: Optional[str] = None):
+        """Forget reads of ``table`` (or of everything); in-flight reads stop accepting joiners"""
+        for key in [k for k, flight in self._flights.items() if table is None or table in flight.tables]:
+            self._flights.pop(key).invalidated = True
+        for key in [k for k, (_, tables, _) in self._reuse.items() if table is None or table in tables]:
+            del self._reuse[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream": self.upstream,
+            "joined": self.joined,
+            "reused": self.reused,
+            "in_flight": len(self._flights),
+            "reusable": len(self._reuse),
+        }
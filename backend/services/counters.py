@@ -0,0 +1,76 @@
+"""
+Precomputed per-clinic counters
+
+The ``clinic_counters`` / ``clinic_daily_counters`` tables are kept current by
+triggers on appointments, lab tests and pharmacy items (see the
+``clinic_counters`` migration), so dashboards read them with one small RPC.
+``CounterReconciler`` periodically recomputes them from the base tables to
+repair any drift.
+"""
+
+from datetime import date
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAMES = ("total_appointments", "patients_today", "pending_lab_tests", "low_stock_items")
+
+# Counter tables plus the tables whose triggers maintain them
+COUNTED_TABLES = ("clinic_counters", "clinic_daily_counters", "appointments", "lab_tests", "pharmacy_items")
+
+
+async def read_clinic_counters(clinic_id: str, day: date) -> Dict[str, int]:
+    """Counters for a clinic, with ``patients_today`` taken for ``day``"""
+    result = await db.rpc("get_clinic_counters", {
+        "p_clinic_id": clinic_id,
+        "p_date": day.isoformat(),
+    }, reads=COUNTED_TABLES).execute()
+    counters = result.data or {}
+    return {name: int(counters.get(name) or 0) for name in COUNTER_NAMES}
+
+
+async def reconcile_clinic_counters(clinic_id: Optional[str] = None) -> int:
+    """Recompute counters from the base tables; returns the number of rows corrected"""
+    params = {"p_clinic_id": clinic_id} if clinic_id else {}
+    result = await db.rpc("reconcile_clinic_counters", params).execute()
+    return int(result.data or 0)
+
+
+class CounterReconciler:
+    """Background task that repairs counter drift every ``interval_seconds``"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                corrected = await reconcile_clinic_counters()
+            except Exception:
+                logger.exception("Counter reconciliation failed")
+                continue
+            if corrected:
+                logger.warning("Counter reconciliation corrected %d rows", corrected)
+
+
+counter_reconciler = CounterReconciler(float(os.getenv("COUNTER_RECONCILE_SECONDS", 300)))
@@ -0,0 +1,407 @@
+"""
+Shared async data-access layer
+
+Routers build queries with the same chained API as supabase-py
+(``db.table("appointments").select("*").eq(...)``) and ``await`` the final
+``execute()``. The work is delegated to a pluggable backend: the default
+``PostgrestBackend`` talks to Supabase over a pooled keep-alive HTTP client,
+while ``services.memory_backend.MemoryBackend`` runs in-process for tests and
+benchmarks.
+"""
+
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+import os
+import time as clock
+
+import httpx
+
+from .coalescing import ReadCoalescer, tables_read
+
+
+class DatabaseError(Exception):
+    """Raised when the backend rejects a query"""
+
+    def __init__(self, status_code: int, message: str, code: Optional[str] = None, details: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.details = details
+
+
+class Filter(NamedTuple):
+    """A single predicate; ``operator`` "or"/"and" nests a list of filters"""
+    column: Optional[str]
+    operator: str
+    value: Any
+
+
+def where(column: str, operator: str, value: Any) -> Filter:
+    return Filter(column, operator, value)
+
+
+def any_of(*filters: Filter) -> Filter:
+    return Filter(None, "or", list(filters))
+
+
+def all_of(*filters: Filter) -> Filter:
+    return Filter(None, "and", list(filters))
+
+
+@dataclass
+class QueryResult:
+    data: Any
+    count: Optional[int] = None
+
+
+class Query:
+    """Chainable query description, executed by the active backend"""
+
+    def __init__(self, database: "Database", table: str, method: str = "select"):
+        self._database = database
+        self.table = table
+        self.method = method
+        self.columns = "*"
+        self.count: Optional[str] = None
+        self.filters: List[Filter] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit_count: Optional[int] = None
+        self.offset_count: Optional[int] = None
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        # Tables a read-only RPC depends on; None for RPCs that may write
+        self.reads: Optional[FrozenSet[str]] = None
+
+    # Verbs
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "Query":
+        if self.method == "select":
+            self.count = count
+        self.columns = columns
+        return self
+
+    def insert(self, rows: Any) -> "Query":
+        self.method = "insert"
+        self.payload = rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: Optional[str] = None) -> "Query":
+        self.method = "upsert"
+        self.payload = rows
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "Query":
+        self.method = "update"
+        self.payload = values
+        return self
+
+    def delete(self) -> "Query":
+        self.method = "delete"
+        return self
+
+    # Filters
+    def filter(self, column: str, operator: str, value: Any) -> "Query":
+        self.filters.append(Filter(column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "lte", value)
+
+    def in_(self, column: str, values: List[Any]) -> "Query":
+        return self.filter(column, "in", list(values))
+
+    def is_(self, column: str, value: Any) -> "Query":
+        return self.filter(column, "is", value)
+
+    def or_(self, *filters: Filter) -> "Query":
+        self.filters.append(any_of(*filters))
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False) -> "Query":
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "Query":
+        self.limit_count = count
+        return self
+
+    def offset(self, count: int) -> "Query":
+        self.offset_count = count
+        return self
+
+    async def execute(self) -> QueryResult:
+        return await self._database.execute(self)
+
+
+def format_value(value: Any) -> str:
+    """Render a Python value the way PostgREST expects it in a filter"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _quote(value: Any) -> str:
+    text = format_value(value)
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _encode_condition(condition: Filter) -> str:
+    if condition.operator in ("or", "and"):
+        inner = ",".join(_encode_condition(c) for c in condition.value)
+        return f"{condition.operator}({inner})"
+    if condition.operator == "in":
+        return f"{condition.column}.in.({','.join(_quote(v) for v in condition.value)})"
+    if condition.operator == "is":
+        return f"{condition.column}.is.{format_value(condition.value)}"
+    return f"{condition.column}.{condition.operator}.{_quote(condition.value)}"
+
+
+def _encode_filter(condition: Filter) -> Tuple[str, str]:
+    if condition.operator in ("or", "and"):
+        inner = ",".join(_encode_condition(c) for c in condition.value)
+        return condition.operator, f"({inner})"
+    if condition.operator == "in":
+        return condition.column, f"in.({','.join(_quote(v) for v in condition.value)})"
+    return condition.column, f"{condition.operator}.{format_value(condition.value)}"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PostgrestBackend:
+    """Supabase PostgREST backend over a shared, pooled httpx client"""
+
+    _methods = {"select": "GET", "insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE"}
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout: float = 10.0,
+        http2: bool = True,
+    ):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.timeout = timeout
+        self.http2 = http2 and _http2_available()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._auth = None
+
+    @classmethod
+    def from_env(cls) -> "PostgrestBackend":
+        return cls(
+            os.getenv("SUPABASE_URL", ""),
+            os.getenv("SUPABASE_SERVICE_KEY", ""),
+            max_connections=int(os.getenv("DB_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.getenv("DB_MAX_KEEPALIVE", 20)),
+            timeout=float(os.getenv("DB_TIMEOUT_SECONDS", 10)),
+        )
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def auth(self):
+        # GoTrue calls go through a single shared supabase-py client
+        if self._auth is None:
+            from supabase import create_client
+            self._auth = create_client(self.url, self.key).auth
+        return self._auth
+
+    async def execute(self, query: Query) -> QueryResult:
+        if self._client is None:
+            raise RuntimeError("PostgrestBackend is not started")
+
+        headers = {}
+        prefer = []
+        params: List[Tuple[str, str]] = []
+
+        if query.method == "rpc":
+            response = await self._client.post(f"/rpc/{query.table}", json=query.payload or {})
+            return self._parse(response)
+
+        if query.method == "select" or query.columns != "*":
+            params.append(("select", query.columns))
+        params.extend(_encode_filter(f) for f in query.filters)
+        if query.orders:
+            params.append(("order", ",".join(f"{column}.{'desc' if desc else 'asc'}" for column, desc in query.orders)))
+        if query.limit_count is not None:
+            params.append(("limit", str(query.limit_count)))
+        if query.offset_count is not None:
+            params.append(("offset", str(query.offset_count)))
+
+        if query.count:
+            prefer.append(f"count={query.count}")
+        if query.method != "select":
+            prefer.append("return=representation")
+        if query.method == "upsert":
+            prefer.append("resolution=merge-duplicates")
+            if query.on_conflict:
+                params.append(("on_conflict", query.on_conflict))
+        if prefer:
+            headers["Prefer"] = ",".join(prefer)
+
+        response = await self._client.request(
+            self._methods[query.method],
+            f"/{query.table}",
+            params=params,
+            headers=headers,
+            json=query.payload if query.method in ("insert", "upsert", "update") else None,
+        )
+        return self._parse(response)
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> QueryResult:
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {"message": response.text}
+            raise DatabaseError(
+                response.status_code,
+                body.get("message", "Database request failed"),
+                code=body.get("code"),
+                details=body.get("details"),
+            )
+
+        data = response.json() if response.content else []
+        count = None
+        content_range = response.headers.get("content-range")
+        if content_range and "/" in content_range:
+            total = content_range.split("/")[-1]
+            if total != "*":
+                count = int(total)
+        return QueryResult(data=data, count=count)
+
+
+class Database:
+    """Process-wide entry point; the backend is opened and closed by the app lifespan"""
+
+    def __init__(self):
+        self._backend = None
+        self._connected = False
+        self._query_hooks: List[Callable[[Query, float], None]] = []
+        # Identical concurrent selects share one upstream call
+        self.coalescer: Optional[ReadCoalescer] = None
+        if os.getenv("DB_COALESCE_READS", "true").lower() in ("1", "true", "yes", "on"):
+            self.coalescer = ReadCoalescer(reuse_seconds=float(os.getenv("DB_READ_REUSE_SECONDS", 0)))
+
+    def configure(self, backend):
+        """Swap the backend (e.g. an in-process stand-in) before the app starts"""
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = PostgrestBackend.from_env()
+        return self._backend
+
+    @property
+    def auth(self):
+        return self.backend.auth
+
+    async def connect(self):
+        if not self._connected:
+            await self.backend.start()
+            self._connected = True
+
+    async def disconnect(self):
+        if self._connected:
+            await self.backend.close()
+            self._connected = False
+
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None, reads: Optional[Sequence[str]] = None) -> Query:
+        """Call a database function; pass ``reads`` (the tables it reads) for read-only ones
+
+        Read-only calls are coalesced like selects and only invalidated by writes
+        to the tables they read; any other call is treated as a write to all tables.
+        """
+        query = Query(self, function, method="rpc")
+        query.payload = params or {}
+        if reads is not None:
+            query.reads = frozenset(reads)
+        return query
+
+    def add_query_hook(self, hook: Callable[[Query, float], None]):
+        """Call ``hook(query, seconds)`` after every executed query, failed or not"""
+        self._query_hooks.append(hook)
+
+    async def execute(self, query: Query) -> QueryResult:
+        started = clock.perf_counter()
+        try:
+            if self.coalescer is None:
+                return await self.backend.execute(query)
+            if query.method == "select" or query.reads is not None:
+                return await self._coalesced(query)
+            try:
+                return await self.backend.execute(query)
+            finally:
+                # Reads issued after this write must not see what was read before it
+                self.coalescer.invalidate(None if query.method == "rpc" else query.table)
+        finally:
+            elapsed = clock.perf_counter() - started
+            for hook in self._query_hooks:
+                hook(query, elapsed)
+
+    async def _coalesced(self, query: Query) -> QueryResult:
+        async def fetch():
+            result = await self.backend.execute(query)
+            return result.data, result.count
+
+        key = ReadCoalescer.key(
+            query.table, query.columns, query.filters, query.orders,
+            query.limit_count, query.offset_count, query.count, query.payload,
+        )
+        tables = query.reads if query.reads is not None else tables_read(query.table, query.columns)
+        data, count = await self.coalescer.run(key, tables, fetch)
+        return QueryResult(data=data, count=count)
+
+
+db = Database()
@@ -0,0 +1,209 @@
+"""
+Idempotency-Key support for retried POSTs
+
+Clients on flaky networks resend creates. For opted-in routes a request that
+carries an ``Idempotency-Key`` header is recorded with a fingerprint of its
+body; a retry with the same key and body gets the stored response replayed
+byte for byte without reaching the handler (or the database), and a duplicate
+that arrives while the original is still running waits for it instead of
+racing it. Reusing a key for a different body is rejected with 422.
+
+Keys are scoped to the caller's token subject and kept for ``ttl_seconds``
+with LRU eviction. Anonymous callers (registration) have no subject, so their
+keys are scoped to the request fingerprint instead: unrelated clients that
+pick the same key never see each other's responses, and a key reused for a
+different body simply starts a new request. The store is
+per-process, so a retry routed to another worker is not deduplicated.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import json
+import time
+
+MAX_KEY_LENGTH = 255
+
+# Outcomes the client is expected to retry; they do not consume the key
+RETRYABLE_STATUSES = (401, 408, 425, 429)
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    status: int = 0
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+
+
+class IdempotencyMiddleware:
+    def __init__(
+        self,
+        app,
+        paths: Sequence[str],
+        subject_lookup: Optional[Callable[[str], Optional[str]]] = None,
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 10000,
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.subject_lookup = subject_lookup
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self.replays = 0
+        self.waits = 0
+        self.mismatches = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope.get("path") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key", b"").decode("latin-1").strip()
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._error(send, 400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+            return
+
+        subject = self._subject(headers)
+        if subject is None:
+            # Unauthenticated request to an authenticated route; let the app reject it
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(scope.get("query_string", b"") + b"?" + body).hexdigest()
+        if subject == "":
+            subject = f"anonymous:{fingerprint}"
+        key = (subject, scope["path"], idempotency_key)
+
+        while True:
+            entry = self._get(key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                self.mismatches += 1
+                await self._error(send, 422, "Idempotency-Key was already used for a different request")
+                return
+            if not entry.done.is_set():
+                self.waits += 1
+                await entry.done.wait()
+                # The original may have ended without a stored response; look again
+                continue
+            self.replays += 1
+            await send({
+                "type": "http.response.start",
+                "status": entry.status,
+                "headers": entry.headers + [(b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        entry = _Entry(fingerprint, time.monotonic() + self.ttl_seconds)
+        self._put(key, entry)
+        try:
+            status, response_headers, response_body = await self._capture(scope, receive, body)
+        except BaseException:
+            self._entries.pop(key, None)
+            entry.done.set()
+            raise
+
+        if status >= 500 or status in RETRYABLE_STATUSES:
+            self._entries.pop(key, None)
+        else:
+            entry.status, entry.headers, entry.body = status, response_headers, response_body
+        entry.done.set()
+
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": response_body})
+
+    def _subject(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if not authorization:
+            # Anonymous routes such as registration; scoped by fingerprint by the caller
+            return ""
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token or self.subject_lookup is None:
+            return None
+        return self.subject_lookup(token)
+
+    def _get(self, key: Tuple[str, str, str]) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # In-flight entries never expire under a waiter
+        if entry.done.is_set() and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: Tuple[str, str, str], entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            if not self._entries[oldest].done.is_set():
+                break
+            del self._entries[oldest]
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    async def _capture(self, scope, receive, body: bytes):
+        status, response_headers, chunks = 500, [], []
+        sent = False
+
+        async def replay_receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Body already read here; later reads only report a disconnect
+            return await receive()
+
+        async def capture_send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, replay_receive, capture_send)
+        return status, response_headers, b"".join(chunks)
+
+    @staticmethod
+    async def _error(send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "replays": self.replays,
+            "waits": self.waits,
+            "mismatches": self.mismatches,
+        }
@@ -0,0 +1,217 @@
+"""
+Per-request instrumentation
+
+``InstrumentationMiddleware`` times every HTTP request and, through the
+database query hook, every Supabase call made while serving it. Aggregates are
+kept as histograms in a process-local ``Registry`` and rendered in Prometheus
+text format by the internal stats endpoint. Requests slower than
+``slow_request_seconds`` are logged with the shape of each query they ran.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import bisect
+import logging
+import time
+
+from .db import Query, db
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def query_shape(query: Query) -> str:
+    """Query without its values, e.g. ``select appointments [clinic_id.eq, appointment_date.gte] order=appointment_time``"""
+    def describe(condition) -> str:
+        if condition.operator in ("or", "and"):
+            return f"{condition.operator}({', '.join(describe(c) for c in condition.value)})"
+        return f"{condition.column}.{condition.operator}"
+
+    shape = f"{query.method} {query.table}"
+    if query.filters:
+        shape += f" [{', '.join(describe(f) for f in query.filters)}]"
+    if query.orders:
+        shape += " order=" + ",".join(f"{column}{' desc' if desc else ''}" for column, desc in query.orders)
+    return shape
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            # One slot per bucket, then +Inf, sum
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(labels + (('le', le),))} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_labels(labels)} {value:g}")
+        return lines
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "HTTP requests by route and status")
+        self.request_duration = Histogram("http_request_duration_seconds", "Wall time per request", LATENCY_BUCKETS)
+        self.response_size = Histogram("http_response_size_bytes", "Response body size", SIZE_BUCKETS)
+        self.request_db_calls = Histogram("http_request_db_calls", "Database calls made per request", CALL_BUCKETS)
+        self.request_db_seconds = Histogram("http_request_db_seconds", "Database call time per request, summed over concurrent calls", LATENCY_BUCKETS)
+        self.db_duration = Histogram("db_query_duration_seconds", "Database call latency by route and table", LATENCY_BUCKETS)
+
+    def render(self) -> str:
+        metrics = (
+            self.requests,
+            self.request_duration,
+            self.response_size,
+            self.request_db_calls,
+            self.request_db_seconds,
+            self.db_duration,
+        )
+        lines = [line for metric in metrics for line in metric.render()]
+        return "\n".join(lines + _coalescing_lines()) + "\n"
+
+
+def _coalescing_lines() -> List[str]:
+    """Select calls by how they were served: upstream, joined in flight, or reused"""
+    if db.coalescer is None:
+        return []
+    stats = db.coalescer.stats()
+    lines = ["# HELP db_reads_total Selects and read-only RPCs by outcome of read coalescing", "# TYPE db_reads_total counter"]
+    for outcome in ("upstream", "joined", "reused"):
+        lines.append(f'db_reads_total{{outcome="{outcome}"}} {stats[outcome]}')
+    return lines
+
+
+@dataclass
+class RequestTrace:
+    # (table, operation, shape, seconds) per database call
+    queries: List[Tuple[str, str, str, float]] = field(default_factory=list)
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+registry = Registry()
+
+
+def _record_query(query: Query, seconds: float):
+    trace = _trace.get()
+    if trace is None:
+        # Background work (reconciler, queue resync) outside any request
+        registry.db_duration.observe(seconds, route="background", table=query.table, operation=query.method)
+        return
+    trace.queries.append((query.table, query.method, query_shape(query), seconds))
+
+
+db.add_query_hook(_record_query)
+
+
+def _route_label(scope, status: int) -> str:
+    # Templated paths keep label cardinality bounded
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Served by the response cache before routing; those paths are a fixed set
+    if status in (200, 304):
+        return scope["path"]
+    return "unmatched"
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app, slow_request_seconds: float = 0.0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        reset = _trace.set(trace)
+        status, size, streaming = 500, 0, False
+
+        async def measuring_send(message):
+            nonlocal status, size, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = dict(message.get("headers", [])).get(b"content-type", b"").startswith(b"text/event-stream")
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, measuring_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            _trace.reset(reset)
+            self._observe(scope["method"], _route_label(scope, status), status, elapsed, size, streaming, trace)
+
+    def _observe(self, method: str, route: str, status: int, elapsed: float, size: int, streaming: bool, trace: RequestTrace):
+        registry.requests.inc(method=method, route=route, status=str(status))
+        registry.request_db_calls.observe(len(trace.queries), method=method, route=route)
+        registry.request_db_seconds.observe(sum(seconds for *_, seconds in trace.queries), method=method, route=route)
+        for table, operation, _, seconds in trace.queries:
+            registry.db_duration.observe(seconds, route=route, table=table, operation=operation)
+        if streaming:
+            # Event streams stay open for minutes; their wall time is not a latency
+            return
+        registry.request_duration.observe(elapsed, method=method, route=route)
+        registry.response_size.observe(size, method=method, route=route)
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            logger.warning(
+                "Slow request %s %s: %.0fms, %d bytes, %d queries%s",
+                method,
+                route,
+                elapsed * 1000,
+                size,
+                len(trace.queries),
+                "".join(f"\n  {seconds * 1000:7.1f}ms  {shape}" for _, _, shape, seconds in trace.queries),
+            )
+
@@ -0,0 +1,161 @@
+"""
+JWT signing and verification keys
+
+Keys are loaded once per process. Tokens are signed with the current key and
+carry its ``kid``; verification picks the key by ``kid`` and pins the
+algorithm to that key's, so rotation is a matter of moving the old secret to
+``JWT_PREVIOUS_SECRET_KEYS`` (or keeping the old public key in the JWKS file)
+until its tokens have expired. Tokens issued before ``kid`` existed are tried
+against the HMAC keys.
+
+For asymmetric signing, ``JWT_PRIVATE_KEY_FILE`` holds the PEM private key and
+``JWT_JWKS_FILE`` a local copy of the public JWKS. An unknown ``kid`` re-reads
+the JWKS file, at most once per ``jwks_refresh_seconds``, so verification
+itself never does I/O.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import time
+
+import jwt
+
+from .settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+
+
+@dataclass
+class VerificationKey:
+    kid: str
+    key: Any
+    algorithm: str
+
+
+def hmac_kid(secret: str) -> str:
+    """Stable identifier for an HMAC secret that does not reveal it"""
+    return "hs-" + hashlib.sha256(secret.encode()).hexdigest()[:12]
+
+
+class KeyRing:
+    def __init__(
+        self,
+        signing_key: Any,
+        signing_algorithm: str,
+        signing_kid: str,
+        keys: List[VerificationKey],
+        jwks_file: Optional[str] = None,
+        jwks_refresh_seconds: float = 300.0,
+        token_lifetime: timedelta = timedelta(minutes=60),
+    ):
+        self.signing_key = signing_key
+        self.signing_algorithm = signing_algorithm
+        self.signing_kid = signing_kid
+        self.jwks_file = jwks_file
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+        self.token_lifetime = token_lifetime
+        self._keys: Dict[str, VerificationKey] = {key.kid: key for key in keys}
+        # The first unknown kid always re-reads the file, even right after startup
+        self._jwks_checked_at = float("-inf")
+        self._jwks_mtime = _mtime(jwks_file)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "KeyRing":
+        keys: List[VerificationKey] = []
+        algorithm = settings.jwt_algorithm
+        hmac_algorithm = algorithm if algorithm in HMAC_ALGORITHMS else "HS256"
+        for secret in filter(None, (settings.jwt_secret_key,) + settings.jwt_previous_secret_keys):
+            keys.append(VerificationKey(hmac_kid(secret), secret, hmac_algorithm))
+        if settings.jwt_jwks_file:
+            keys += _load_jwks(settings.jwt_jwks_file)
+
+        if settings.jwt_private_key_file:
+            if algorithm in HMAC_ALGORITHMS:
+                raise ValueError(f"JWT_ALGORITHM {algorithm} cannot sign with JWT_PRIVATE_KEY_FILE")
+            with open(settings.jwt_private_key_file, "rb") as f:
+                signing_key = jwt.algorithms.get_default_algorithms()[algorithm].prepare_key(f.read())
+            signing_kid = settings.jwt_key_id or "default"
+            if signing_kid not in {key.kid for key in keys}:
+                keys.append(VerificationKey(signing_kid, signing_key.public_key(), algorithm))
+        else:
+            signing_key = settings.jwt_secret_key
+            signing_kid = hmac_kid(settings.jwt_secret_key) if settings.jwt_secret_key else ""
+            algorithm = hmac_algorithm
+
+        return cls(
+            signing_key, algorithm, signing_kid, keys,
+            jwks_file=settings.jwt_jwks_file,
+            token_lifetime=timedelta(minutes=settings.jwt_expire_minutes),
+        )
+
+    def configure(self, settings: Settings):
+        """Reload every key from ``settings`` in place, so existing references see them"""
+        self.__dict__.update(KeyRing.from_settings(settings).__dict__)
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self.signing_key, algorithm=self.signing_algorithm, headers={"kid": self.signing_kid})
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a valid, unexpired token, or None"""
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.PyJWTError:
+            return None
+
+        if kid is None:
+            candidates = [key for key in self._keys.values() if key.algorithm in HMAC_ALGORITHMS]
+        else:
+            key = self._keys.get(kid) or self._refresh_jwks(kid)
+            candidates = [key] if key is not None else []
+
+        for key in candidates:
+            try:
+                return jwt.decode(token, key.key, algorithms=[key.algorithm], options={"require": ["exp"]})
+            except jwt.InvalidSignatureError:
+                continue
+            except jwt.PyJWTError:
+                return None
+        return None
+
+    def _refresh_jwks(self, kid: str) -> Optional[VerificationKey]:
+        now = time.monotonic()
+        if not self.jwks_file or now - self._jwks_checked_at < self.jwks_refresh_seconds:
+            return None
+        self._jwks_checked_at = now
+        mtime = _mtime(self.jwks_file)
+        if mtime == self._jwks_mtime:
+            return None
+        self._jwks_mtime = mtime
+        try:
+            for key in _load_jwks(self.jwks_file):
+                self._keys[key.kid] = key
+        except (OSError, ValueError, jwt.PyJWTError):
+            logger.exception("Could not reload JWKS from %s", self.jwks_file)
+        return self._keys.get(kid)
+
+
+def _mtime(path: Optional[str]) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime if path else None
+    except OSError:
+        return None
+
+
+def _load_jwks(path: str) -> List[VerificationKey]:
+    with open(path) as f:
+        jwks = jwt.PyJWKSet.from_dict(json.load(f))
+    return [
+        VerificationKey(key.key_id, key.key, key.algorithm_name)
+        for key in jwks.keys
+        if key.key_id
+    ]
+
+
+key_ring = KeyRing.from_settings(get_settings())
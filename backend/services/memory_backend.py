@@ -0,0 +1,390 @@
+"""
+In-process stand-in for the Supabase PostgREST and auth surface
+
+Implements enough of PostgREST's semantics (filters, ordering, counts,
+embedded resources, writes and RPC) for the routers to run unchanged in tests
+and benchmarks. ``latency_seconds`` adds a simulated network round trip to
+every call; auth calls sleep synchronously, like the supabase-py client does.
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import inspect
+import time as clock
+import uuid
+
+from .db import DatabaseError, Filter, Query, QueryResult
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _coerce(stored: Any, value: Any) -> Any:
+    """Cast a filter value to the stored column's type, like Postgres would"""
+    value = _normalize(value)
+    if isinstance(stored, bool) and isinstance(value, str):
+        return value == "true"
+    if isinstance(stored, (int, float)) and not isinstance(stored, bool) and isinstance(value, str):
+        try:
+            return type(stored)(value)
+        except ValueError:
+            raise DatabaseError(400, f'invalid input syntax for type numeric: "{value}"', code="22P02")
+    return value
+
+
+def _compare(stored: Any, operator: str, value: Any) -> bool:
+    if operator == "is":
+        return stored is _normalize(value)
+    if operator == "in":
+        return stored in [_coerce(stored, v) for v in value]
+    if stored is None:
+        return False
+    value = _coerce(stored, value)
+    if operator == "eq":
+        return stored == value
+    if operator == "neq":
+        return stored != value
+    if operator == "gt":
+        return stored > value
+    if operator == "gte":
+        return stored >= value
+    if operator == "lt":
+        return stored < value
+    if operator == "lte":
+        return stored <= value
+    raise DatabaseError(400, f"unsupported operator: {operator}", code="PGRST100")
+
+
+def matches(row: Dict[str, Any], condition: Filter) -> bool:
+    if condition.operator == "or":
+        return any(matches(row, c) for c in condition.value)
+    if condition.operator == "and":
+        return all(matches(row, c) for c in condition.value)
+    return _compare(row.get(condition.column), condition.operator, condition.value)
+
+
+def _split_columns(columns: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _singular(table: str) -> str:
+    return table[:-1] if table.endswith("s") else table
+
+
+def _sort_key(value: Any):
+    # NULLs sort last for ascending order, matching Postgres
+    return (value is None, value if value is not None else 0)
+
+
+# (index name, columns, optional partial-index predicate)
+UniqueIndex = Tuple[str, Tuple[str, ...], Optional[Callable[[Dict[str, Any]], bool]]]
+
+
+class MemoryAuth:
+    """Synchronous GoTrue look-alike keyed by email"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.users: Dict[str, Dict[str, str]] = {}
+        self.latency_seconds = latency_seconds
+
+    def add_user(self, email: str, password: str, user_id: Optional[str] = None) -> str:
+        user_id = user_id or str(uuid.uuid4())
+        self.users[email] = {"id": user_id, "password": password}
+        return user_id
+
+    def _round_trip(self):
+        if self.latency_seconds > 0:
+            clock.sleep(self.latency_seconds)
+
+    def _response(self, email: str):
+        user = SimpleNamespace(id=self.users[email]["id"], email=email)
+        return SimpleNamespace(user=user, session=None)
+
+    def sign_in_with_password(self, credentials: Dict[str, str]):
+        self._round_trip()
+        account = self.users.get(credentials["email"])
+        if not account or account["password"] != credentials["password"]:
+            raise Exception("Invalid login credentials")
+        return self._response(credentials["email"])
+
+    def sign_up(self, credentials: Dict[str, str]):
+        self._round_trip()
+        if credentials["email"] in self.users:
+            raise Exception("User already registered")
+        self.add_user(credentials["email"], credentials["password"])
+        return self._response(credentials["email"])
+
+
+class MemoryBackend:
+    """Tables are plain lists of dict rows; RPC functions are Python callables"""
+
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        functions: Optional[Dict[str, Callable]] = None,
+        unique_indexes: Optional[Dict[str, List[UniqueIndex]]] = None,
+        latency_seconds: float = 0.0,
+    ):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            name: [self._versioned(name, None, self._generate(name, dict(row))) for row in rows]
+            for name, rows in (tables or {}).items()
+        }
+        self.functions: Dict[str, Callable] = {**SQL_FUNCTIONS, **(functions or {})}
+        self.unique_indexes = UNIQUE_INDEXES if unique_indexes is None else unique_indexes
+        self.latency_seconds = latency_seconds
+        self.auth = MemoryAuth(latency_seconds)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    async def execute(self, query: Query) -> QueryResult:
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        if query.method == "rpc":
+            return await self._rpc(query)
+
+        rows = [row for row in self.rows(query.table) if all(matches(row, f) for f in query.filters)]
+
+        if query.method == "select":
+            for column, desc in reversed(query.orders):
+                rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=desc)
+            count = len(rows) if query.count else None
+            start = query.offset_count or 0
+            end = start + query.limit_count if query.limit_count is not None else None
+            data = [self._project(query.table, row, query.columns) for row in rows[start:end]]
+            return QueryResult(data=data, count=count)
+
+        if query.method == "delete":
+            table = self.rows(query.table)
+            for row in rows:
+                table.remove(row)
+            return QueryResult(data=[self._project(query.table, row, query.columns) for row in rows])
+
+        # Writes are computed first and applied only if every unique index holds,
+        # so a batch either lands completely or not at all
+        if query.method == "insert":
+            changes = [(None, self._new_row(values)) for values in self._payload_rows(query)]
+        elif query.method == "upsert":
+            changes = [self._upsert(query.table, values, query.on_conflict or "id") for values in self._payload_rows(query)]
+        elif query.method == "update":
+            changes = [(row, self._updated(row, query.payload)) for row in rows]
+        else:
+            raise DatabaseError(400, f"unsupported method: {query.method}")
+        changes = [(current, self._versioned(query.table, current, self._generate(query.table, new))) for current, new in changes]
+
+        self._check_unique(query.table, changes)
+        written = []
+        for current, new in changes:
+            if current is None:
+                self.rows(query.table).append(new)
+                written.append(new)
+            else:
+                current.update(new)
+                written.append(current)
+
+        return QueryResult(data=[self._project(query.table, row, query.columns) for row in written])
+
+    async def _rpc(self, query: Query) -> QueryResult:
+        function = self.functions.get(query.table)
+        if function is None:
+            raise DatabaseError(404, f"Could not find the function public.{query.table}", code="PGRST202")
+        result = function(self, **(query.payload or {}))
+        if inspect.isawaitable(result):
+            result = await result
+        return QueryResult(data=result)
+
+    @staticmethod
+    def _payload_rows(query: Query) -> List[Dict[str, Any]]:
+        return query.payload if isinstance(query.payload, list) else [query.payload]
+
+    def _new_row(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow().isoformat()
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now}
+        row.update({key: _normalize(value) for key, value in values.items()})
+        return row
+
+    def _updated(self, row: Dict[str, Any], values: Dict[str, Any]) -> Dict[str, Any]:
+        updated = {**row, **{key: _normalize(value) for key, value in values.items()}}
+        updated["updated_at"] = datetime.utcnow().isoformat()
+        return updated
+
+    def _upsert(self, table: str, values: Dict[str, Any], on_conflict: str):
+        keys = [key.strip() for key in on_conflict.split(",")]
+        for row in self.rows(table):
+            if all(row.get(key) == _normalize(values.get(key)) for key in keys):
+                return row, self._updated(row, values)
+        return None, self._new_row(values)
+
+    @staticmethod
+    def _generate(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        for column, expression in GENERATED_COLUMNS.get(table, {}).items():
+            row[column] = expression(row)
+        return row
+
+    @staticmethod
+    def _versioned(table: str, current: Optional[Dict[str, Any]], row: Dict[str, Any]) -> Dict[str, Any]:
+        if table in VERSIONED_TABLES:
+            # Like the BEFORE UPDATE trigger: every write to an existing row bumps it
+            row["version"] = current.get("version", 1) + 1 if current is not None else row.get("version") or 1
+        return row
+
+    def _check_unique(self, table: str, changes):
+        indexes = self.unique_indexes.get(table)
+        if not indexes:
+            return
+        replaced = {id(current) for current, _ in changes if current is not None}
+        final = [row for row in self.rows(table) if id(row) not in replaced] + [new for _, new in changes]
+        for name, columns, predicate in indexes:
+            seen = set()
+            for row in final:
+                key = tuple(row.get(column) for column in columns)
+                if None in key or (predicate is not None and not predicate(row)):
+                    continue
+                if key in seen:
+                    raise DatabaseError(
+                        409,
+                        f'duplicate key value violates unique constraint "{name}"',
+                        code="23505",
+                    )
+                seen.add(key)
+
+    def _project(self, table: str, row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for column in _split_columns(columns):
+            if column == "*":
+                result.update(row)
+            elif "(" in column:
+                name, inner = column.split("(", 1)
+                result[name.strip()] = self._embed(table, row, name.strip(), inner[:-1])
+            else:
+                result[column] = row.get(column)
+        return result
+
+    def _embed(self, table: str, row: Dict[str, Any], target: str, columns: str) -> Any:
+        foreign_key = f"{_singular(target)}_id"
+        if foreign_key in row:
+            # Many-to-one: the row references the target
+            for candidate in self.rows(target):
+                if candidate.get("id") == row[foreign_key]:
+                    return self._project(target, candidate, columns)
+            return None
+        # One-to-many: target rows reference this row
+        back_reference = f"{_singular(table)}_id"
+        return [
+            self._project(target, candidate, columns)
+            for candidate in self.rows(target)
+            if candidate.get(back_reference) == row.get("id")
+        ]
+
+
+# Stand-ins for the SQL functions declared in supabase/migrations. Counters are
+# computed on read here, which is what a perfectly reconciled table would hold.
+
+def _is_low_stock(item: Dict[str, Any]) -> bool:
+    quantity, reorder_level = item.get("quantity_available"), item.get("reorder_level")
+    return quantity is not None and reorder_level is not None and quantity <= reorder_level
+
+
+def _get_clinic_counters(backend: MemoryBackend, p_clinic_id: str, p_date: str) -> Dict[str, int]:
+    appointments = [a for a in backend.rows("appointments") if a.get("clinic_id") == p_clinic_id]
+    return {
+        "total_appointments": len(appointments),
+        "patients_today": sum(1 for a in appointments if a.get("appointment_date") == p_date),
+        "pending_lab_tests": sum(
+            1 for t in backend.rows("lab_tests")
+            if t.get("clinic_id") == p_clinic_id and t.get("status") in ("ordered", "collected", "processing")
+        ),
+        "low_stock_items": sum(
+            1 for i in backend.rows("pharmacy_items")
+            if i.get("clinic_id") == p_clinic_id and _is_low_stock(i)
+        ),
+    }
+
+
+def _reconcile_clinic_counters(backend: MemoryBackend, p_clinic_id: Optional[str] = None, p_since: Optional[str] = None) -> int:
+    return 0
+
+
+def _revenue_summary(
+    backend: MemoryBackend,
+    p_clinic_id: str,
+    p_from: str,
+    p_to: str,
+    p_transaction_type: str = "income",
+) -> Dict[str, Any]:
+    total, count = Decimal(0), 0
+    by_category: Dict[str, Decimal] = {}
+    by_payment_method: Dict[str, Decimal] = {}
+    for tx in backend.rows("accounts_tx"):
+        if (
+            tx.get("clinic_id") != p_clinic_id
+            or tx.get("transaction_type") != p_transaction_type
+            or not p_from <= (tx.get("transaction_date") or "") <= p_to
+        ):
+            continue
+        amount = Decimal(str(tx["amount"]))
+        total += amount
+        count += 1
+        category = tx.get("category")
+        method = tx.get("payment_method") or "unspecified"
+        by_category[category] = by_category.get(category, Decimal(0)) + amount
+        by_payment_method[method] = by_payment_method.get(method, Decimal(0)) + amount
+    return {
+        "total": str(total),
+        "count": count,
+        "by_category": {k: str(v) for k, v in by_category.items()},
+        "by_payment_method": {k: str(v) for k, v in by_payment_method.items()},
+    }
+
+
+SQL_FUNCTIONS: Dict[str, Callable] = {
+    "get_clinic_counters": _get_clinic_counters,
+    "revenue_summary": _revenue_summary,
+    "reconcile_clinic_counters": _reconcile_clinic_counters,
+}
+
+
+# Mirrors the generated (STORED) columns declared in supabase/migrations
+GENERATED_COLUMNS: Dict[str, Dict[str, Callable[[Dict[str, Any]], Any]]] = {
+    "pharmacy_items": {"is_low_stock": _is_low_stock},
+}
+
+
+# Tables whose ``version`` column is bumped by a trigger on every update
+VERSIONED_TABLES = ("appointments",)
+
+
+# Mirrors the unique indexes declared in supabase/migrations
+UNIQUE_INDEXES: Dict[str, List[UniqueIndex]] = {
+    "appointments": [
+        (
+            "uniq_appointments_active_slot",
+            ("doctor_id", "appointment_date", "appointment_time"),
+            lambda row: row.get("status") in ("scheduled", "confirmed", "in_progress"),
+        ),
+        ("uniq_appointments_doctor_token", ("doctor_id", "appointment_date", "token_number"), None),
+    ],
+}
@@ -0,0 +1,418 @@
+"""
+Outbound notifications (appointment confirmations) off the request path
+
+Requests only ``enqueue()`` a notification: one local SQLite insert, no
+network. Dispatch workers claim due rows in batches, resolve recipients with
+one query per batch, and hand the messages to the configured ``Provider``.
+Failed sends are retried with exponential backoff; rows that exhaust
+``max_attempts`` (or fail permanently, e.g. an invalid number) move to the
+``dead_letters`` table for inspection. Claims are leases, so rows held by a
+worker that died are picked up again once the lease runs out.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+
+import httpx
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+# How long stop() waits for workers to finish an in-flight batch
+STOP_TIMEOUT_SECONDS = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class PermanentFailure(Exception):
+    """The provider rejected the message; retrying will not help"""
+
+
+@dataclass
+class Notification:
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+@dataclass
+class Message:
+    to: str
+    text: str
+
+
+class Provider(ABC):
+    """Delivers messages; ``send_batch`` returns None or the error for each message"""
+
+    name = "provider"
+
+    @abstractmethod
+    async def send(self, message: Message):
+        """Deliver one message; raise to fail it (``PermanentFailure`` to skip retries)"""
+
+    async def send_batch(self, messages: Sequence[Message]) -> List[Optional[Exception]]:
+        results = await asyncio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    async def close(self):
+        pass
+
+
+class FakeProvider(Provider):
+    """Records messages instead of sending them; for local runs and tests"""
+
+    name = "fake"
+
+    def __init__(self, latency_seconds: float = 0.0, fail: Optional[Callable[[Message], Optional[Exception]]] = None):
+        self.latency_seconds = latency_seconds
+        self.fail = fail
+        self.sent: List[Message] = []
+
+    async def send(self, message: Message):
+        if self.latency_seconds > 0:
+            await asyncio.sleep(self.latency_seconds)
+        error = self.fail(message) if self.fail else None
+        if error is not None:
+            raise error
+        self.sent.append(message)
+
+
+class WhatsAppProvider(Provider):
+    """WhatsApp Business Cloud API text messages"""
+
+    name = "whatsapp"
+
+    def __init__(self, token: str, phone_number_id: str, timeout: float = 10.0, api_url: str = "https://graph.facebook.com/v19.0"):
+        self.base_url = f"{api_url}/{phone_number_id}"
+        self.token = token
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def send(self, message: Message):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                timeout=self.timeout,
+            )
+        response = await self._client.post("/messages", json={
+            "messaging_product": "whatsapp",
+            "to": message.to,
+            "type": "text",
+            "text": {"body": message.text},
+        })
+        if response.status_code < 400:
+            return
+        # Throttling and server errors are retried; other client errors are not
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RuntimeError(f"WhatsApp API {response.status_code}: {response.text[:200]}")
+        raise PermanentFailure(f"WhatsApp API {response.status_code}: {response.text[:200]}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# kind -> coroutine turning a batch of notifications into one message (or error) each
+Composer = Callable[[List[Notification]], Awaitable[List[Any]]]
+
+
+async def compose_appointment_confirmations(notifications: List[Notification]) -> List[Any]:
+    """Confirmation texts, with every patient's phone fetched in one query"""
+    patient_ids = sorted({n.payload["patient_id"] for n in notifications})
+    result = await db.table("patients")\
+        .select("id, first_name, phone")\
+        .in_("id", patient_ids)\
+        .execute()
+    patients = {patient["id"]: patient for patient in result.data}
+
+    messages: List[Any] = []
+    for notification in notifications:
+        patient = patients.get(notification.payload["patient_id"])
+        if not patient or not patient.get("phone"):
+            messages.append(PermanentFailure("Patient has no phone number"))
+            continue
+        appointment = notification.payload
+        messages.append(Message(
+            to=patient["phone"],
+            text=(
+                f"Hello {patient.get('first_name') or ''}, your appointment is confirmed for "
+                f"{appointment['appointment_date']} at {appointment['appointment_time'][:5]}. "
+                f"Token number: {appointment.get('token_number')}."
+            ),
+        ))
+    return messages
+
+
+class NotificationOutbox:
+    def __init__(
+        self,
+        path: str,
+        provider: Provider,
+        workers: int = 2,
+        batch_size: int = 50,
+        max_attempts: int = 6,
+        backoff_seconds: float = 5.0,
+        max_backoff_seconds: float = 3600.0,
+        claim_seconds: float = 120.0,
+        poll_seconds: float = 1.0,
+        linger_seconds: float = 0.2,
+    ):
+        self.path = path
+        self.provider = provider
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.claim_seconds = claim_seconds
+        self.poll_seconds = poll_seconds
+        self.linger_seconds = linger_seconds
+        self.composers: Dict[str, Composer] = {"appointment_confirmation": compose_appointment_confirmations}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        # Ids leased by this process and not yet settled
+        self._claimed: Set[int] = set()
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Short busy timeout: this runs on the event loop
+            self._conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            # WAL keeps enqueue cheap: appends without an fsync per commit
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> Optional[int]:
+        """Store a notification for delivery; never touches the network
+
+        A failure here is logged rather than raised: the write that triggered
+        the notification has already happened.
+        """
+        now = time.time()
+        try:
+            cursor = self._connect().execute(
+                "INSERT INTO outbox (kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload, default=str), now, now),
+            )
+        except sqlite3.Error:
+            logger.exception("Could not enqueue %s notification", kind)
+            return None
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return cursor.lastrowid
+
+    def _claim(self) -> List[Notification]:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts FROM outbox"
+                " WHERE next_attempt_at <= ? AND claimed_until <= ?"
+                " ORDER BY next_attempt_at LIMIT ?",
+                (now, now, self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                [(now + self.claim_seconds, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._claimed.update(row[0] for row in rows)
+        return [Notification(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+        # Jitter spreads retries of a failed batch instead of resending it in lockstep
+        return delay * random.uniform(0.5, 1.0)
+
+    def _settle(self, notifications: List[Notification], errors: List[Optional[Exception]]):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for notification, error in zip(notifications, errors):
+                if error is None:
+                    conn.execute("DELETE FROM outbox WHERE id = ?", (notification.id,))
+                    self.sent += 1
+                    continue
+                attempts = notification.attempts + 1
+                if isinstance(error, PermanentFailure) or attempts >= self.max_attempts:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO dead_letters (id, kind, payload, attempts, last_error, created_at, failed_at)"
+                        " SELECT id, kind, payload, ?, ?, created_at, ? FROM outbox WHERE id = ?",
+                        (attempts, repr(error), now, notification.id),
+                    )
+                    conn.execute("DELETE FROM outbox WHERE id = ?", (notification.id,))
+                    self.dead += 1
+                    logger.warning("Notification %s moved to dead letters: %r", notification.id, error)
+                else:
+                    conn.execute(
+                        "UPDATE outbox SET attempts = ?, last_error = ?, next_attempt_at = ?, claimed_until = 0 WHERE id = ?",
+                        (attempts, repr(error), now + self._backoff(attempts), notification.id),
+                    )
+                    self.retried += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._claimed.difference_update(notification.id for notification in notifications)
+
+    async def _deliver(self, notifications: List[Notification]) -> List[Optional[Exception]]:
+        errors: List[Optional[Exception]] = [None] * len(notifications)
+        by_kind: Dict[str, List[int]] = {}
+        for index, notification in enumerate(notifications):
+            by_kind.setdefault(notification.kind, []).append(index)
+
+        for kind, indexes in by_kind.items():
+            composer = self.composers.get(kind)
+            if composer is None:
+                for index in indexes:
+                    errors[index] = PermanentFailure(f"Unknown notification kind {kind!r}")
+                continue
+            try:
+                composed = await composer([notifications[index] for index in indexes])
+            except Exception as e:
+                for index in indexes:
+                    errors[index] = e
+                continue
+            sendable = [(index, message) for index, message in zip(indexes, composed) if isinstance(message, Message)]
+            for index, message in zip(indexes, composed):
+                if isinstance(message, Exception):
+                    errors[index] = message
+            if sendable:
+                results = await self.provider.send_batch([message for _, message in sendable])
+                for (index, _), error in zip(sendable, results):
+                    errors[index] = error
+        return errors
+
+    async def dispatch_once(self) -> int:
+        """Deliver one batch of due notifications; returns how many were claimed"""
+        notifications = self._claim()
+        if notifications:
+            self._settle(notifications, await self._deliver(notifications))
+        return len(notifications)
+
+    async def _worker(self):
+        wakeup, stopping = self._wakeup, self._stopping
+        while not stopping.is_set():
+            try:
+                claimed = await self.dispatch_once()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                wakeup.clear()
+                # Not wait_for(): a cancellation racing the wakeup would be
+                # swallowed, and stop() is signalled through its own event anyway
+                waiters = {asyncio.ensure_future(wakeup.wait()), asyncio.ensure_future(stopping.wait())}
+                try:
+                    done, _ = await asyncio.wait(waiters, timeout=self.poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+                if not done or stopping.is_set():
+                    continue
+                # Let a burst of bookings accumulate into one batch
+                await asyncio.sleep(self.linger_seconds)
+
+    async def start(self):
+        self._connect()
+        if self.workers > 0 and not self._tasks:
+            self._wakeup = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        if self._tasks:
+            self._stopping.set()
+            for task in self._tasks:
+                task.cancel()
+            done, pending = await asyncio.wait(self._tasks, timeout=STOP_TIMEOUT_SECONDS)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error("Notification worker failed", exc_info=task.exception())
+            for task in pending:
+                logger.warning("Notification worker %s did not stop within %ss", task.get_name(), STOP_TIMEOUT_SECONDS)
+        self._tasks = []
+        self._wakeup = None
+        self._stopping = None
+        if self._conn is not None:
+            # Batches cut short by shutdown are sent again on the next start;
+            # leases held by other processes sharing the file are left alone
+            self._conn.executemany("UPDATE outbox SET claimed_until = 0 WHERE id = ?", [(notification_id,) for notification_id in self._claimed])
+            self._claimed.clear()
+            self._conn.close()
+            self._conn = None
+        await self.provider.close()
+
+    def stats(self) -> Dict[str, int]:
+        pending, = self._connect().execute("SELECT count(*) FROM outbox").fetchone()
+        dead_letters, = self._connect().execute("SELECT count(*) FROM dead_letters").fetchone()
+        return {
+            "pending": pending,
+            "dead_letters": dead_letters,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+        }
+
+
+def provider_from_env() -> Provider:
+    name = os.getenv("NOTIFICATION_PROVIDER") or ("whatsapp" if os.getenv("WHATSAPP_TOKEN") else "fake")
+    if name == "whatsapp":
+        return WhatsAppProvider(os.getenv("WHATSAPP_TOKEN", ""), os.getenv("WHATSAPP_PHONE_NUMBER_ID", ""))
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown NOTIFICATION_PROVIDER {name!r}")
+
+
+notifications = NotificationOutbox(
+    os.getenv("NOTIFICATION_OUTBOX_PATH", "notifications.db"),
+    provider_from_env(),
+    workers=int(os.getenv("NOTIFICATION_WORKERS", 2)),
+    batch_size=int(os.getenv("NOTIFICATION_BATCH_SIZE", 50)),
+    max_attempts=int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 6)),
+    backoff_seconds=float(os.getenv("NOTIFICATION_BACKOFF_SECONDS", 5)),
+)
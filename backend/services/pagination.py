@@ -0,0 +1,42 @@
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the opaque, URL-safe encoding of the sort-key values of the last
+row on a page. The next page filters for rows strictly after it, which stays
+cheap at any depth, unlike OFFSET.
+"""
+
+from typing import Any, Dict, List, Sequence
+import base64
+import json
+
+from .db import Filter, all_of, where
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row: Dict[str, Any], columns: Sequence[str]) -> str:
+    payload = json.dumps([row[column] for column in columns], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[str]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def after(columns: Sequence[str], values: Sequence[Any]) -> List[Filter]:
+    """Branches that, OR-ed together, select rows strictly after ``values`` in ascending order"""
+    branches = []
+    for i, column in enumerate(columns):
+        equal = [where(columns[j], "eq", values[j]) for j in range(i)]
+        branches.append(all_of(*equal, where(column, "gt", values[i])) if equal else where(column, "gt", values[i]))
+    return branches
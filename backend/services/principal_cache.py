@@ -0,0 +1,96 @@
+"""
+Bounded in-process cache of authenticated principals
+
+``get_current_user`` resolves the token subject to a ``users`` row on every
+request; this cache keeps recent principals for a short TTL with LRU
+eviction. Registration and login refresh the entry themselves; the API has no
+other write path to ``users``, so role or ``is_active`` changes made elsewhere
+(the Supabase dashboard, SQL) take effect within ``ttl_seconds``. A write path
+added to the API must call ``invalidate`` / ``invalidate_user``.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import time
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, principal = entry
+        if expires_at <= self._clock():
+            del self._entries[subject]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return dict(principal)
+
+    def peek(self, subject: str) -> Optional[Dict[str, Any]]:
+        """Like ``get`` but leaves the hit/miss statistics and LRU order alone"""
+        entry = self._entries.get(subject)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return dict(entry[1])
+
+    def set(self, subject: str, principal: Dict[str, Any]):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[subject] = (self._clock() + self.ttl_seconds, dict(principal))
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, subject: str):
+        """Drop the principal cached for a token subject (auth user id)"""
+        if self._entries.pop(subject, None) is not None:
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop the principal for a ``users.id`` row, whatever its subject"""
+        for subject, (_, principal) in list(self._entries.items()):
+            if principal.get("id") == user_id:
+                del self._entries[subject]
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_entries=int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60)),
+)
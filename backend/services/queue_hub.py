@@ -0,0 +1,131 @@
+"""
+Live doctor queues pushed to subscribers
+
+A queue per (doctor, day) is loaded with the ``*, patients(*)`` join when its
+first subscriber connects and kept in memory while anyone is listening.
+Appointment writes in this worker are folded in via ``publish`` and fanned out
+to subscribers as small deltas. Writes made by other workers are picked up by
+a periodic resync (one query per doctor-day, not per client), which also
+publishes only the rows that changed.
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import contextvars
+import logging
+import os
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+# Statuses shown in a doctor's queue
+QUEUE_STATUSES = ("scheduled", "confirmed", "in_progress")
+
+
+class DoctorQueue:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.resync_task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return sorted(self.entries.values(), key=lambda a: (a["appointment_time"], a.get("token_number") or 0))
+
+
+class QueueHub:
+    def __init__(self, resync_seconds: float = 30.0, max_pending: int = 100):
+        self.resync_seconds = resync_seconds
+        self.max_pending = max_pending
+        self._queues: Dict[Tuple[str, str], DoctorQueue] = {}
+
+    async def _fetch(self, doctor_id: str, day: str) -> Dict[str, Dict[str, Any]]:
+        result = await db.table("appointments")\
+            .select("*, patients(*)")\
+            .eq("doctor_id", doctor_id)\
+            .eq("appointment_date", day)\
+            .in_("status", list(QUEUE_STATUSES))\
+            .order("appointment_time")\
+            .execute()
+        return {appointment["id"]: appointment for appointment in result.data}
+
+    async def subscribe(self, doctor_id: str, day: str) -> Tuple[List[Dict[str, Any]], asyncio.Queue]:
+        """Register a subscriber; returns the current snapshot and its event mailbox"""
+        key = (doctor_id, day)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = DoctorQueue()
+
+        async with queue.lock:
+            if not queue.loaded:
+                queue.entries = await self._fetch(doctor_id, day)
+                queue.loaded = True
+            if queue.resync_task is None and self.resync_seconds > 0:
+                # Fresh context: the loop outlives this request and must not
+                # inherit its per-request state (e.g. the instrumentation trace)
+                queue.resync_task = asyncio.create_task(self._resync(doctor_id, day, queue), context=contextvars.Context())
+            mailbox: asyncio.Queue = asyncio.Queue()
+            queue.subscribers.add(mailbox)
+            return queue.snapshot(), mailbox
+
+    def unsubscribe(self, doctor_id: str, day: str, mailbox: asyncio.Queue):
+        key = (doctor_id, day)
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        queue.subscribers.discard(mailbox)
+        if not queue.subscribers:
+            if queue.resync_task is not None:
+                queue.resync_task.cancel()
+            del self._queues[key]
+
+    async def publish(self, appointment: Dict[str, Any]):
+        """Fold a written appointment row into its queue, if anyone is watching it"""
+        queue = self._queues.get((appointment.get("doctor_id"), appointment.get("appointment_date")))
+        if queue is None or not queue.loaded:
+            return
+
+        appointment_id = appointment["id"]
+        if appointment.get("status") in QUEUE_STATUSES:
+            entry = {**queue.entries.get(appointment_id, {}), **appointment}
+            if "patients" not in entry:
+                result = await db.table("patients").select("*").eq("id", appointment["patient_id"]).execute()
+                entry["patients"] = result.data[0] if result.data else None
+            queue.entries[appointment_id] = entry
+            self._broadcast(queue, {"type": "upsert", "appointment": entry})
+        elif queue.entries.pop(appointment_id, None) is not None:
+            self._broadcast(queue, {"type": "remove", "id": appointment_id})
+
+    def _broadcast(self, queue: DoctorQueue, event: Dict[str, Any]):
+        for mailbox in queue.subscribers:
+            if mailbox.qsize() >= self.max_pending:
+                # Slow consumer: replace its backlog with a fresh snapshot
+                while not mailbox.empty():
+                    mailbox.get_nowait()
+                mailbox.put_nowait({"type": "snapshot", "queue": queue.snapshot()})
+            else:
+                mailbox.put_nowait(event)
+
+    async def _resync(self, doctor_id: str, day: str, queue: DoctorQueue):
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            try:
+                fresh = await self._fetch(doctor_id, day)
+            except Exception:
+                logger.exception("Queue resync failed for doctor %s on %s", doctor_id, day)
+                continue
+            for appointment_id in set(queue.entries) - set(fresh):
+                del queue.entries[appointment_id]
+                self._broadcast(queue, {"type": "remove", "id": appointment_id})
+            for appointment_id, appointment in fresh.items():
+                if queue.entries.get(appointment_id) != appointment:
+                    queue.entries[appointment_id] = appointment
+                    self._broadcast(queue, {"type": "upsert", "appointment": appointment})
+
+
+queue_hub = QueueHub(
+    resync_seconds=float(os.getenv("QUEUE_RESYNC_SECONDS", 30)),
+    max_pending=int(os.getenv("QUEUE_MAX_PENDING_EVENTS", 100)),
+)
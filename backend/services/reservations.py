@@ -0,0 +1,203 @@
+"""
+Slot reservation and token allocation for appointments
+
+Each (doctor, day) gets an in-memory slot map loaded with one query on first
+use. Bookings for that doctor and day are serialized by a per-day lock, so the
+availability check and token assignment are atomic within the worker and a
+booking costs a single INSERT. The partial unique indexes on ``appointments``
+are the cross-worker guarantee: a unique violation means another worker got
+there first, so the day is reloaded and the booking retried or rejected.
+"""
+
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+
+from .db import DatabaseError, db
+
+# Statuses that occupy a doctor's time slot
+ACTIVE_STATUSES = ("scheduled", "confirmed", "in_progress")
+
+UNIQUE_VIOLATION = "23505"
+
+
+class SlotUnavailable(Exception):
+    """The requested (doctor, date, time) slot is already booked"""
+
+
+class DaySchedule:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.booked: Dict[str, str] = {}
+        self.next_token = 1
+
+    def observe(self, appointment: Dict[str, Any]):
+        """Fold a written appointment row into the slot map"""
+        slot = appointment["appointment_time"]
+        if appointment.get("status") in ACTIVE_STATUSES:
+            self.booked[slot] = appointment["id"]
+        elif self.booked.get(slot) == appointment["id"]:
+            del self.booked[slot]
+        if appointment.get("token_number"):
+            self.next_token = max(self.next_token, appointment["token_number"] + 1)
+
+
+class ReservationEngine:
+    def __init__(self, max_days: int = 5000, max_attempts: int = 3):
+        self.max_days = max_days
+        self.max_attempts = max_attempts
+        self._days: "OrderedDict[Tuple[str, str], DaySchedule]" = OrderedDict()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Call ``listener(row)`` for every appointment booked or observed here"""
+        self._listeners.append(listener)
+
+    def _notify(self, appointment: Dict[str, Any]):
+        for listener in self._listeners:
+            listener(appointment)
+
+    def _schedule(self, doctor_id: str, day: str) -> DaySchedule:
+        key = (doctor_id, day)
+        schedule = self._days.get(key)
+        if schedule is None:
+            schedule = self._days[key] = DaySchedule()
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        self._days.move_to_end(key)
+        return schedule
+
+    async def _load(self, doctor_id: str, day: str, schedule: DaySchedule):
+        result = await db.table("appointments")\
+            .select("id, appointment_time, status, token_number")\
+            .eq("doctor_id", doctor_id)\
+            .eq("appointment_date", day)\
+            .execute()
+        schedule.booked.clear()
+        schedule.next_token = 1
+        for appointment in result.data:
+            schedule.observe(appointment)
+        schedule.loaded = True
+
+    async def book(self, appointment: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a scheduled appointment with the next token; raises SlotUnavailable"""
+        doctor_id, day, slot = appointment["doctor_id"], appointment["appointment_date"], appointment["appointment_time"]
+        schedule = self._schedule(doctor_id, day)
+
+        async with schedule.lock:
+            if not schedule.loaded:
+                await self._load(doctor_id, day, schedule)
+
+            for attempt in range(self.max_attempts):
+                if slot in schedule.booked:
+                    if attempt > 0:
+                        raise SlotUnavailable()
+                    # Our view may predate a cancellation made by another worker
+                    await self._load(doctor_id, day, schedule)
+                    if slot in schedule.booked:
+                        raise SlotUnavailable()
+
+                row = {**appointment, "token_number": schedule.next_token, "status": "scheduled"}
+                try:
+                    result = await db.table("appointments").insert(row).execute()
+                except DatabaseError as e:
+                    if e.code != UNIQUE_VIOLATION:
+                        raise
+                    # Another worker booked this slot or token; resync and retry
+                    await self._load(doctor_id, day, schedule)
+                    continue
+
+                created = result.data[0]
+                schedule.observe(created)
+                self._notify(created)
+                return created
+
+        raise SlotUnavailable()
+
+    async def _load_range(self, keys: List[Tuple[str, str]]):
+        """Reload several doctor-days with one range query"""
+        doctor_ids = sorted({doctor_id for doctor_id, _ in keys})
+        days = sorted({day for _, day in keys})
+        result = await db.table("appointments")\
+            .select("id, doctor_id, appointment_date, appointment_time, status, token_number")\
+            .in_("doctor_id", doctor_ids)\
+            .gte("appointment_date", days[0])\
+            .lte("appointment_date", days[-1])\
+            .execute()
+        schedules = {key: self._schedule(*key) for key in keys}
+        for schedule in schedules.values():
+            schedule.booked.clear()
+            schedule.next_token = 1
+            schedule.loaded = True
+        for appointment in result.data:
+            schedule = schedules.get((appointment["doctor_id"], appointment["appointment_date"]))
+            if schedule is not None:
+                schedule.observe(appointment)
+
+    async def book_many(self, appointments: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Book a batch with one range query and one INSERT
+
+        Returns the created row for each input, or None where the slot was taken
+        (already booked, or requested twice within the batch).
+        """
+        keys = sorted({(a["doctor_id"], a["appointment_date"]) for a in appointments})
+        schedules = [self._schedule(*key) for key in keys]
+
+        # Locks are taken in key order so concurrent batches cannot deadlock
+        async with AsyncExitStack() as stack:
+            for schedule in schedules:
+                await stack.enter_async_context(schedule.lock)
+
+            for attempt in range(self.max_attempts):
+                await self._load_range(keys)
+                results: List[Optional[Dict[str, Any]]] = [None] * len(appointments)
+                accepted, rows = [], []
+                for index, appointment in enumerate(appointments):
+                    schedule = self._days[(appointment["doctor_id"], appointment["appointment_date"])]
+                    if appointment["appointment_time"] in schedule.booked:
+                        continue
+                    row = {**appointment, "token_number": schedule.next_token, "status": "scheduled"}
+                    schedule.booked[appointment["appointment_time"]] = ""
+                    schedule.next_token += 1
+                    accepted.append(index)
+                    rows.append(row)
+
+                if not rows:
+                    return results
+                try:
+                    result = await db.table("appointments").insert(rows).execute()
+                except DatabaseError as e:
+                    if e.code != UNIQUE_VIOLATION:
+                        for schedule in schedules:
+                            schedule.loaded = False
+                        raise
+                    # Another worker booked into one of these days; recompute the batch
+                    continue
+
+                for index, created in zip(accepted, result.data):
+                    self._days[(created["doctor_id"], created["appointment_date"])].observe(created)
+                    self._notify(created)
+                    results[index] = created
+                return results
+
+        raise SlotUnavailable()
+
+    def observe(self, appointment: Dict[str, Any]):
+        """Keep loaded slot maps current after an appointment is updated or cancelled"""
+        if not {"doctor_id", "appointment_date", "appointment_time"} <= appointment.keys():
+            return
+        schedule = self._days.get((appointment["doctor_id"], appointment["appointment_date"]))
+        if schedule is not None and schedule.loaded:
+            schedule.observe(appointment)
+        self._notify(appointment)
+
+    def forget(self, doctor_id: Optional[str] = None):
+        """Drop cached slot maps (all, or one doctor's) so they reload on next use"""
+        for key in [k for k in self._days if doctor_id is None or k[0] == doctor_id]:
+            del self._days[key]
+
+
+reservations = ReservationEngine(max_days=int(os.getenv("RESERVATION_CACHE_DAYS", 5000)))
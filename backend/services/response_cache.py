@@ -0,0 +1,159 @@
+"""
+HTTP response cache for read-mostly GET routes
+
+Responses of opted-in routes are stored as pre-serialized and pre-gzipped
+bytes with a strong ETag per encoding, so a hit skips the handler,
+response-model validation and JSON encoding entirely, and ``If-None-Match``
+revalidation is answered with 304. Routes that depend on the caller opt in with
+``per_clinic=True``: the key then includes the caller's clinic, taken from a
+verified token whose principal is already cached; anything else falls through
+to the app uncached, which also enforces authentication as usual.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import gzip
+import hashlib
+import time
+
+# Bodies smaller than this are not worth compressing
+MIN_GZIP_SIZE = 512
+
+
+@dataclass
+class CacheRule:
+    path: str
+    ttl_seconds: float
+    per_clinic: bool = False
+
+
+@dataclass
+class CachedResponse:
+    expires_at: float
+    etag: bytes
+    content_type: bytes
+    body: bytes
+    gzipped: Optional[bytes]
+
+
+class ResponseCacheMiddleware:
+    def __init__(
+        self,
+        app,
+        rules: List[CacheRule],
+        principal_lookup: Optional[Callable[[str], Optional[dict]]] = None,
+        max_entries: int = 1024,
+    ):
+        self.app = app
+        self.rules: Dict[str, CacheRule] = {rule.path: rule for rule in rules}
+        self.principal_lookup = principal_lookup
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def __call__(self, scope, receive, send):
+        rule = self.rules.get(scope.get("path")) if scope["type"] == "http" else None
+        if rule is None or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = self._key(rule, scope, headers)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            await self._respond(entry, rule, headers, send)
+            return
+
+        self.misses += 1
+        status, response_headers, body = await self._capture(scope, receive)
+        content_type = dict(response_headers).get(b"content-type", b"")
+        if status != 200:
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        entry = CachedResponse(
+            expires_at=time.monotonic() + rule.ttl_seconds,
+            etag=b'"' + hashlib.sha256(body).hexdigest()[:32].encode() + b'"',
+            content_type=content_type,
+            body=body,
+            gzipped=gzip.compress(body, 6) if len(body) >= MIN_GZIP_SIZE else None,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        await self._respond(entry, rule, headers, send)
+
+    def _key(self, rule: CacheRule, scope, headers: Dict[bytes, bytes]) -> Optional[Tuple]:
+        key = (scope["path"], scope.get("query_string", b""))
+        if not rule.per_clinic:
+            return key
+
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token or self.principal_lookup is None:
+            return None
+        principal = self.principal_lookup(token)
+        if principal is None or not principal.get("clinic_id"):
+            return None
+        return key + (principal["clinic_id"],)
+
+    async def _capture(self, scope, receive):
+        status, response_headers, chunks = 500, [], []
+
+        async def capture_send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture_send)
+        return status, response_headers, b"".join(chunks)
+
+    async def _respond(self, entry: CachedResponse, rule: CacheRule, headers: Dict[bytes, bytes], send):
+        cache_control = b"private, no-cache" if rule.per_clinic else f"public, max-age={int(rule.ttl_seconds)}".encode()
+        body, etag = entry.body, entry.etag
+        gzipped = entry.gzipped is not None and b"gzip" in headers.get(b"accept-encoding", b"")
+        if gzipped:
+            # Each encoding is a different representation and gets its own strong validator
+            body, etag = entry.gzipped, entry.etag[:-1] + b'-gzip"'
+        response_headers = [
+            (b"etag", etag),
+            (b"cache-control", cache_control),
+            (b"vary", b"Accept-Encoding, Authorization" if rule.per_clinic else b"Accept-Encoding"),
+        ]
+
+        if etag in [tag.strip() for tag in headers.get(b"if-none-match", b"").split(b",")]:
+            self.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": response_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if gzipped:
+            response_headers.append((b"content-encoding", b"gzip"))
+        response_headers += [
+            (b"content-type", entry.content_type),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
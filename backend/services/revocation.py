@@ -0,0 +1,126 @@
+"""
+Revoked access tokens
+
+Logout records the token's ``jti`` with its expiry in ``revoked_tokens`` and
+in this worker's in-memory set; other workers pull new rows every
+``sync_seconds``, re-reading the last ``overlap_seconds`` of ``created_at``
+each time: the column is stamped when the insert starts, so a row can commit
+after a later-stamped one was already seen. Request authentication only consults the in-memory set, and
+entries drop out of it (and out of the table) once the token would have
+expired anyway.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import os
+import time
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are deleted from the table this often
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _timestamp(value: str) -> float:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class RevocationList:
+    def __init__(self, sync_seconds: float = 5.0, overlap_seconds: float = 30.0):
+        self.sync_seconds = sync_seconds
+        self.overlap_seconds = overlap_seconds
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._synced_through: Optional[float] = None
+        self._purged_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: str) -> bool:
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def _add(self, jti: str, expires_at: float):
+        if expires_at <= time.time() or jti in self._expiry:
+            return
+        self._expiry[jti] = expires_at
+        heapq.heappush(self._heap, (expires_at, jti))
+        self._expire()
+
+    def _expire(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, jti = heapq.heappop(self._heap)
+            self._expiry.pop(jti, None)
+
+    async def revoke(self, jti: str, expires_at: float):
+        """Revoke a token until ``expires_at`` (epoch seconds), here and in every worker"""
+        self._add(jti, expires_at)
+        await db.table("revoked_tokens").upsert({
+            "jti": jti,
+            "expires_at": datetime.fromtimestamp(expires_at, timezone.utc).isoformat(),
+        }, on_conflict="jti").execute()
+
+    async def sync(self):
+        """Pull revocations recorded by other workers since the last sync"""
+        query = db.table("revoked_tokens")\
+            .select("jti, expires_at, created_at")\
+            .gt("expires_at", datetime.now(timezone.utc).isoformat())
+        if self._synced_through is not None:
+            # Rows already seen are pulled again and ignored by _add
+            since = datetime.fromtimestamp(self._synced_through - self.overlap_seconds, timezone.utc)
+            query = query.gte("created_at", since.isoformat())
+        result = await query.order("created_at").execute()
+        for row in result.data:
+            self._add(row["jti"], _timestamp(row["expires_at"]))
+        if result.data:
+            self._synced_through = max(self._synced_through or 0.0, _timestamp(result.data[-1]["created_at"]))
+        self._expire()
+
+        if time.monotonic() - self._purged_at > PURGE_INTERVAL_SECONDS:
+            self._purged_at = time.monotonic()
+            await db.table("revoked_tokens")\
+                .delete()\
+                .lt("expires_at", datetime.now(timezone.utc).isoformat())\
+                .execute()
+
+    async def start(self):
+        try:
+            await self.sync()
+        except Exception:
+            logger.exception("Initial token revocation sync failed")
+        if self.sync_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Token revocation sync failed")
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+revocations = RevocationList(
+    sync_seconds=float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 5)),
+    overlap_seconds=float(os.getenv("TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS", 30)),
+)
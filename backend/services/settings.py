@@ -0,0 +1,65 @@
+"""
+Application settings
+
+``get_settings()`` reads ``.env`` and the environment once per process. The
+app factory calls it before importing any service module, so the module-level
+service singletons also see values from ``.env``. An app built with explicit
+settings keeps them on ``app.state.settings``; routes read them through the
+``app_settings`` dependency.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+import os
+
+from dotenv import load_dotenv
+from starlette.requests import Request
+
+
+def _flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    environment: str
+    jwt_secret_key: Optional[str]
+    jwt_algorithm: str
+    jwt_expire_minutes: int
+    # Retired HMAC secrets still accepted for verification during rotation
+    jwt_previous_secret_keys: Tuple[str, ...]
+    # Asymmetric signing: PEM private key plus the JWKS holding public keys
+    jwt_private_key_file: Optional[str]
+    jwt_key_id: Optional[str]
+    jwt_jwks_file: Optional[str]
+    internal_stats_token: Optional[str]
+    idempotency_ttl_seconds: float
+    slow_request_seconds: float
+    warmup_on_startup: bool
+
+
+def app_settings(request: Request) -> Settings:
+    """Dependency: the settings the running app was built with"""
+    return getattr(request.app.state, "settings", None) or get_settings()
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    load_dotenv()
+    return Settings(
+        environment=os.getenv("ENVIRONMENT", "development"),
+        jwt_secret_key=os.getenv("JWT_SECRET_KEY"),
+        jwt_algorithm=os.getenv("JWT_ALGORITHM", "HS256"),
+        jwt_expire_minutes=int(os.getenv("JWT_EXPIRE_MINUTES", 60)),
+        jwt_previous_secret_keys=tuple(
+            key.strip() for key in os.getenv("JWT_PREVIOUS_SECRET_KEYS", "").split(",") if key.strip()
+        ),
+        jwt_private_key_file=os.getenv("JWT_PRIVATE_KEY_FILE") or None,
+        jwt_key_id=os.getenv("JWT_KEY_ID") or None,
+        jwt_jwks_file=os.getenv("JWT_JWKS_FILE") or None,
+        internal_stats_token=os.getenv("INTERNAL_STATS_TOKEN") or None,
+        idempotency_ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400)),
+        slow_request_seconds=float(os.getenv("SLOW_REQUEST_SECONDS", 0)),
+        warmup_on_startup=_flag("WARMUP_ON_STARTUP"),
+    )
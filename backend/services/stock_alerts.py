@@ -0,0 +1,93 @@
+"""
+Low-stock and expiring pharmacy items per clinic
+
+Both lists come from one query over the indexed ``is_low_stock`` flag and
+``expiry_date`` (see the ``pharmacy_stock_alerts`` migration) and are cached
+per clinic. Writes to ``pharmacy_items`` made through ``db`` in this worker
+drop the affected clinics' entries as they complete; the TTL bounds how long
+writes made elsewhere (other workers, the Supabase dashboard) take to show up.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import os
+import time
+
+from .db import Query, db, where
+
+WRITE_METHODS = ("insert", "upsert", "update", "delete")
+
+
+@dataclass
+class StockAlerts:
+    low_stock_items: List[Dict[str, Any]]
+    expiring_items: List[Dict[str, Any]]
+
+
+class StockAlertEngine:
+    def __init__(self, ttl_seconds: float = 60.0, expiry_window_days: int = 60):
+        self.ttl_seconds = ttl_seconds
+        self.expiry_window_days = expiry_window_days
+        self._entries: Dict[Tuple[str, date], Tuple[float, StockAlerts]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def alerts(self, clinic_id: str, today: date) -> StockAlerts:
+        key = (clinic_id, today)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # Concurrent misses for a clinic share one query
+        lock = self._locks.setdefault(clinic_id, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            alerts = await self._load(clinic_id, today)
+            self._entries = {k: v for k, v in self._entries.items() if k[0] != clinic_id}
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, alerts)
+            return alerts
+
+    async def _load(self, clinic_id: str, today: date) -> StockAlerts:
+        cutoff = (today + timedelta(days=self.expiry_window_days)).isoformat()
+        result = await db.table("pharmacy_items")\
+            .select("*")\
+            .eq("clinic_id", clinic_id)\
+            .or_(where("is_low_stock", "is", True), where("expiry_date", "lte", cutoff))\
+            .order("expiry_date")\
+            .execute()
+        return StockAlerts(
+            low_stock_items=[item for item in result.data if item.get("is_low_stock")],
+            expiring_items=[item for item in result.data if item.get("expiry_date") and item["expiry_date"] <= cutoff],
+        )
+
+    def invalidate(self, clinic_id: Optional[str] = None):
+        """Call after a clinic's stock, reorder levels or expiry dates change (None: every clinic)"""
+        self._entries = {k: v for k, v in self._entries.items() if clinic_id is not None and k[0] != clinic_id}
+
+    def observe_query(self, query: Query, seconds: float):
+        """Query hook: invalidate the clinics a ``pharmacy_items`` write touched"""
+        if query.table != "pharmacy_items" or query.method not in WRITE_METHODS:
+            return
+        rows = query.payload if isinstance(query.payload, list) else [query.payload or {}]
+        clinic_ids: Set[Optional[str]] = {
+            condition.value for condition in query.filters
+            if condition.column == "clinic_id" and condition.operator == "eq"
+        }
+        if not clinic_ids:
+            # An update or delete by id alone does not say which clinic it hit
+            clinic_ids = {row.get("clinic_id") for row in rows} if query.method in ("insert", "upsert") else {None}
+        if None in clinic_ids:
+            self.invalidate()
+            return
+        for clinic_id in clinic_ids:
+            self.invalidate(clinic_id)
+
+
+stock_alerts = StockAlertEngine(
+    ttl_seconds=float(os.getenv("STOCK_ALERT_TTL_SECONDS", 60)),
+    expiry_window_days=int(os.getenv("STOCK_EXPIRY_WINDOW_DAYS", 60)),
+)
+db.add_query_hook(stock_alerts.observe_query)
@@ -0,0 +1,76 @@
+"""
+Shared fixtures: the full app over an in-process MemoryBackend
+"""
+
+from datetime import date, timedelta
+import os
+import sys
+from pathlib import Path
+
+# Service modules read their configuration when imported
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-that-is-long-enough-0123")
+os.environ["NOTIFICATION_OUTBOX_PATH"] = ":memory:"
+os.environ["NOTIFICATION_PROVIDER"] = "fake"
+os.environ["WARMUP_ON_STARTUP"] = "false"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+import pytest
+
+from main import create_app
+from services.availability import availability
+from services.memory_backend import MemoryBackend
+from services.principal_cache import principal_cache
+from services.reservations import reservations
+from services.settings import get_settings
+
+CLINIC = "c1"
+TOMORROW = (date.today() + timedelta(days=1)).isoformat()
+
+
+def seed():
+    return {
+        "users": [
+            {"id": "u-admin", "auth_user_id": "a-admin", "email": "admin@demo.com", "role": "admin", "clinic_id": CLINIC, "is_active": True},
+            {"id": "u-rec", "auth_user_id": "a-rec", "email": "reception@demo.com", "role": "receptionist", "clinic_id": CLINIC, "is_active": True},
+            {"id": "u-doc", "auth_user_id": "a-doc", "email": "doctor@demo.com", "role": "doctor", "clinic_id": CLINIC, "is_active": True},
+        ],
+        "doctors": [
+            {"id": "d1", "clinic_id": CLINIC, "user_id": "u-doc", "name": "Dr A", "speciality": "Cardiology", "slot_duration_minutes": 30, "start_time": "09:00:00", "end_time": "17:00:00", "available_days": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"], "is_active": True},
+        ],
+        "patients": [
+            {"id": "p1", "user_id": None, "first_name": "S", "last_name": "P", "phone": "1"},
+            {"id": "p2", "user_id": None, "first_name": "K", "last_name": "R", "phone": "2"},
+        ],
+        "appointments": [
+            {"id": "ap1", "patient_id": "p1", "doctor_id": "d1", "clinic_id": CLINIC, "appointment_date": TOMORROW, "appointment_time": "10:00:00", "status": "scheduled", "token_number": 1},
+        ],
+    }
+
+
+def auth_headers(subject: str, **extra: str) -> dict:
+    from routers.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': subject})}", **extra}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend(seed())
+
+
+@pytest.fixture
+async def client(backend):
+    # Worker-local caches would otherwise carry rows over from the previous test
+    get_settings.cache_clear()
+    reservations.forget()
+    availability.forget()
+    principal_cache.clear()
+    app = create_app(backend=backend)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            yield client
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.admission import AdmissionRejected, AuthGate
+
+pytestmark = pytest.mark.anyio
+
+
+async def settle(gate: AuthGate, pending: int):
+    for _ in range(100):
+        if gate._pending == pending:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{gate._pending} calls still pending")
+
+
+async def test_cancelled_caller_holds_its_slot_until_the_call_finishes():
+    gate = AuthGate(max_workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def sign_in():
+        started.set()
+        release.wait(5)
+
+    caller = asyncio.ensure_future(gate.run(sign_in, email="a@demo.com"))
+    while not started.is_set():
+        await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+
+    # The thread is still busy, so the pool is still full
+    with pytest.raises(AdmissionRejected):
+        await gate.run(lambda: None, email="b@demo.com")
+    release.set()
+    await settle(gate, 0)
+    gate.shutdown()
+
+
+async def test_caller_cancelled_while_queued_frees_its_slot():
+    gate = AuthGate(max_workers=1, max_queue=1)
+    started, release = threading.Event(), threading.Event()
+
+    def sign_in():
+        started.set()
+        release.wait(5)
+
+    running = asyncio.ensure_future(gate.run(sign_in, email="a@demo.com"))
+    while not started.is_set():
+        await asyncio.sleep(0.01)
+    queued = asyncio.ensure_future(gate.run(lambda: None, email="b@demo.com"))
+    await asyncio.sleep(0)
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+
+    await settle(gate, 1)
+    release.set()
+    await running
+    await settle(gate, 0)
+    gate.shutdown()
@@ -0,0 +1,26 @@
+from pathlib import Path
+import subprocess
+import sys
+
+from fastapi import FastAPI
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def test_importing_main_builds_nothing():
+    # A fresh interpreter: this one has already imported the services
+    script = "import sys, main; print(sorted(m for m in sys.modules if m.split('.')[0] in ('services', 'routers')))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == "['services', 'services.settings']"
+
+
+def test_app_is_built_on_first_access():
+    import main
+
+    main.__dict__.pop("app", None)
+    try:
+        assert isinstance(main.app, FastAPI)
+        assert main.app is main.app
+    finally:
+        main.__dict__.pop("app", None)
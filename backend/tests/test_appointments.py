@@ -0,0 +1,90 @@
+import pytest
+
+from conftest import TOMORROW, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+BOOKING = {"patient_id": "p2", "doctor_id": "d1", "appointment_date": TOMORROW, "appointment_time": "10:00"}
+
+
+async def test_booking_an_occupied_slot_is_rejected(client, backend):
+    response = await client.post("/appointments/", json=BOOKING, headers=auth_headers("a-rec"))
+
+    assert response.status_code == 409
+    assert len([row for row in backend.rows("appointments") if row["appointment_time"] == "10:00:00"]) == 1
+
+
+async def test_bulk_booking_reports_an_occupied_slot_per_row(client):
+    response = await client.post(
+        "/appointments/bulk",
+        json=[BOOKING, {**BOOKING, "appointment_time": "10:30"}],
+        headers=auth_headers("a-rec"),
+    )
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["conflict", "created"]
+
+
+async def rebook_cancelled_slot(client):
+    """Cancel ap1 and book its slot for another patient"""
+    response = await client.delete("/appointments/ap1", headers=auth_headers("a-admin"))
+    assert response.status_code == 200
+    response = await client.post("/appointments/", json=BOOKING, headers=auth_headers("a-rec"))
+    assert response.status_code == 200
+    return response.json()["appointment"]
+
+
+async def test_patch_reactivating_into_a_rebooked_slot_conflicts(client, backend):
+    await rebook_cancelled_slot(client)
+
+    response = await client.patch("/appointments/ap1", json={"status": "scheduled"}, headers=auth_headers("a-rec"))
+
+    assert response.status_code == 409
+    assert [row["status"] for row in backend.rows("appointments") if row["id"] == "ap1"] == ["cancelled"]
+
+
+async def test_patch_with_current_etag_succeeds(client):
+    headers = auth_headers("a-doc")
+    etag = (await client.get("/appointments/ap1", headers=headers)).headers["etag"]
+
+    response = await client.patch("/appointments/ap1", json={"notes": "A"}, headers={**headers, "If-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_patch_with_stale_etag_is_rejected(client, backend):
+    headers = auth_headers("a-doc")
+    etag = (await client.get("/appointments/ap1", headers=headers)).headers["etag"]
+    await client.patch("/appointments/ap1", json={"notes": "A"}, headers={**headers, "If-Match": etag})
+
+    response = await client.patch("/appointments/ap1", json={"notes": "B"}, headers={**headers, "If-Match": etag})
+
+    assert response.status_code == 412
+    assert [row["notes"] for row in backend.rows("appointments") if row["id"] == "ap1"] == ["A"]
+
+
+async def test_unchanged_appointment_revalidates_with_304(client):
+    headers = auth_headers("a-doc")
+    etag = (await client.get("/appointments/ap1", headers=headers)).headers["etag"]
+
+    response = await client.get("/appointments/ap1", headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_transition_reactivating_into_a_rebooked_slot_reports_a_conflict(client):
+    rebooked = await rebook_cancelled_slot(client)
+
+    response = await client.post(
+        "/appointments/transitions",
+        json=[{"id": "ap1", "status": "scheduled"}, {"id": rebooked["id"], "status": "confirmed"}],
+        headers=auth_headers("a-rec"),
+    )
+
+    assert response.status_code == 200
+    results = {result["id"]: result for result in response.json()["results"]}
+    assert results["ap1"]["status"] == "conflict"
+    assert results[rebooked["id"]]["status"] == "updated"
+    assert (response.json()["updated"], response.json()["failed"]) == (1, 1)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from services.coalescing import ReadCoalescer
+
+pytestmark = pytest.mark.anyio
+
+KEY = ReadCoalescer.key("appointments", "*", (), (), None, None, None)
+
+
+async def test_identical_reads_share_one_call_and_get_their_own_rows():
+    coalescer = ReadCoalescer()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"id": "ap1"}]
+
+    results = await asyncio.gather(*[coalescer.run(KEY, frozenset({"appointments"}), fetch) for _ in range(3)])
+
+    assert len(calls) == 1
+    assert results == [[{"id": "ap1"}]] * 3
+    assert len({id(result) for result in results}) == 3
+
+
+async def test_cancelled_waiter_gives_up_its_copy():
+    coalescer = ReadCoalescer()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return [{"id": "ap1"}]
+
+    waiters = [asyncio.ensure_future(coalescer.run(KEY, frozenset({"appointments"}), fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    flight = coalescer._flights[KEY]
+    waiters[1].cancel()
+    await asyncio.sleep(0)
+
+    assert flight.waiters == 2
+    release.set()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert waiters[0].result() == waiters[2].result() == [{"id": "ap1"}]
+    assert flight.results == []
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from conftest import CLINIC, TOMORROW, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+BOOKING = {"patient_id": "p1", "doctor_id": "d1", "appointment_date": TOMORROW, "appointment_time": "09:00"}
+
+
+async def test_retried_booking_is_replayed(client, backend):
+    headers = auth_headers("a-admin", **{"Idempotency-Key": "k1"})
+    first = await client.post("/appointments/", json=BOOKING, headers=headers)
+
+    retry = await client.post("/appointments/", json=BOOKING, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len([row for row in backend.rows("appointments") if row["appointment_time"] == "09:00:00"]) == 1
+
+
+async def test_retry_waits_for_the_request_in_flight(client, backend):
+    # Slow enough that every retry arrives while the first booking is running
+    backend.latency_seconds = 0.02
+    headers = auth_headers("a-admin", **{"Idempotency-Key": "k1"})
+
+    responses = await asyncio.gather(*[client.post("/appointments/", json=BOOKING, headers=headers) for _ in range(4)])
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.json()["appointment"]["id"] for response in responses}) == 1
+    assert [response.headers.get("idempotent-replayed") for response in responses].count("true") == 3
+    assert len([row for row in backend.rows("appointments") if row["appointment_time"] == "09:00:00"]) == 1
+
+
+async def test_key_reused_for_a_different_request_is_rejected(client):
+    headers = auth_headers("a-admin", **{"Idempotency-Key": "k1"})
+    await client.post("/appointments/", json=BOOKING, headers=headers)
+
+    response = await client.post("/appointments/", json={**BOOKING, "appointment_time": "09:30"}, headers=headers)
+
+    assert response.status_code == 422
+
+
+async def test_anonymous_keys_do_not_collide_across_requests(client):
+    first = await client.post(
+        "/auth/register",
+        json={"email": "one@demo.com", "password": "pw", "role": "patient", "clinic_id": CLINIC},
+        headers={"Idempotency-Key": "1"},
+    )
+    second = await client.post(
+        "/auth/register",
+        json={"email": "two@demo.com", "password": "pw", "role": "patient", "clinic_id": CLINIC},
+        headers={"Idempotency-Key": "1"},
+    )
+
+    assert first.status_code == second.status_code == 200
+    assert "idempotent-replayed" not in second.headers
+    assert second.json()["user"]["email"] == "two@demo.com"
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+import json
+import os
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from services.keyring import KeyRing
+
+
+def rsa_jwk(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    return private_key, {**jwk, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+def test_key_rotated_in_right_after_startup_is_picked_up(tmp_path):
+    jwks_file = tmp_path / "jwks.json"
+    old_key, old_jwk = rsa_jwk("old")
+    jwks_file.write_text(json.dumps({"keys": [old_jwk]}))
+    key_ring = KeyRing(old_key, "RS256", "old", [], jwks_file=str(jwks_file))
+
+    new_key, new_jwk = rsa_jwk("new")
+    jwks_file.write_text(json.dumps({"keys": [old_jwk, new_jwk]}))
+    stat = os.stat(jwks_file)
+    os.utime(jwks_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    claims = {"sub": "a-admin", "exp": datetime.now(timezone.utc) + timedelta(minutes=5)}
+    token = jwt.encode(claims, new_key, algorithm="RS256", headers={"kid": "new"})
+
+    assert key_ring.verify(token)["sub"] == "a-admin"
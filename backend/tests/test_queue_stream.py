@@ -0,0 +1,49 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import CLINIC, TOMORROW, auth_headers
+from routers.appointments import stream_doctor_queue
+
+pytestmark = pytest.mark.anyio
+
+
+class ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+async def open_stream():
+    response = await stream_doctor_queue(
+        "d1", ConnectedRequest(), date_filter=date.fromisoformat(TOMORROW), current_user={"clinic_id": CLINIC}
+    )
+    return response.body_iterator
+
+
+async def test_every_subscriber_receives_the_same_change(client):
+    streams = [await open_stream(), await open_stream()]
+    try:
+        for stream in streams:
+            assert (await stream.__anext__()).startswith("event: snapshot")
+
+        response = await client.patch("/appointments/ap1", json={"notes": "A"}, headers=auth_headers("a-doc"))
+        assert response.status_code == 200
+
+        for stream in streams:
+            event = await asyncio.wait_for(stream.__anext__(), 1)
+            assert event.startswith("event: upsert")
+            assert '"notes": "A"' in event
+    finally:
+        for stream in streams:
+            await stream.aclose()
+
+
+async def test_other_clinics_doctor_is_not_found(client):
+    with pytest.raises(HTTPException) as error:
+        await stream_doctor_queue(
+            "d1", ConnectedRequest(), date_filter=date.fromisoformat(TOMORROW), current_user={"clinic_id": "c2"}
+        )
+
+    assert error.value.status_code == 404
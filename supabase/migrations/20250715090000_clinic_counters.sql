@@ -0,0 +1,281 @@
+/*
+  # Incrementally maintained clinic counters
+
+  1. New Tables
+    - `clinic_counters` - Running totals per clinic (appointments, pending lab
+      tests, low-stock pharmacy items)
+    - `clinic_daily_counters` - Appointments per clinic and day
+
+  2. Triggers
+    - `appointments`, `lab_tests` and `pharmacy_items` adjust the counters on
+      every insert, update and delete, so the dashboard overview reads
+      precomputed values instead of running exact-count scans
+    - The trigger functions run as their owner; the `bump_*` helpers they
+      call are not executable by API roles
+
+  3. Functions
+    - `get_clinic_counters(clinic_id, date)` - One-row read used by /metrics/overview
+    - `reconcile_clinic_counters(clinic_id, since)` - Recomputes counters from the
+      base tables and returns how many rows drifted; run periodically by the API
+      with the service role, the only role allowed to execute it
+*/
+
+-- Create counter tables
+CREATE TABLE IF NOT EXISTS public.clinic_counters (
+  clinic_id uuid PRIMARY KEY REFERENCES public.clinics(id) ON DELETE CASCADE,
+  total_appointments bigint NOT NULL DEFAULT 0,
+  pending_lab_tests bigint NOT NULL DEFAULT 0,
+  low_stock_items bigint NOT NULL DEFAULT 0,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.clinic_daily_counters (
+  clinic_id uuid NOT NULL REFERENCES public.clinics(id) ON DELETE CASCADE,
+  counter_date date NOT NULL,
+  appointments bigint NOT NULL DEFAULT 0,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (clinic_id, counter_date)
+);
+
+ALTER TABLE public.clinic_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.clinic_daily_counters ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Clinic members can read counters"
+  ON public.clinic_counters
+  FOR SELECT
+  TO authenticated
+  USING (clinic_id IN (
+    SELECT clinic_id FROM public.users WHERE auth_user_id = auth.uid()
+    UNION
+    SELECT hospital_id FROM public.users WHERE auth_user_id = auth.uid()
+  ));
+
+CREATE POLICY "Clinic members can read daily counters"
+  ON public.clinic_daily_counters
+  FOR SELECT
+  TO authenticated
+  USING (clinic_id IN (
+    SELECT clinic_id FROM public.users WHERE auth_user_id = auth.uid()
+    UNION
+    SELECT hospital_id FROM public.users WHERE auth_user_id = auth.uid()
+  ));
+
+-- Counter helpers
+CREATE OR REPLACE FUNCTION public.bump_clinic_counter(p_clinic_id uuid, p_counter text, p_delta bigint)
+RETURNS void
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_clinic_id IS NULL OR p_delta = 0 THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.clinic_counters (clinic_id)
+  VALUES (p_clinic_id)
+  ON CONFLICT (clinic_id) DO NOTHING;
+
+  EXECUTE format(
+    'UPDATE public.clinic_counters SET %I = %I + $1, updated_at = now() WHERE clinic_id = $2',
+    p_counter, p_counter
+  ) USING p_delta, p_clinic_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.bump_clinic_daily_counter(p_clinic_id uuid, p_date date, p_delta bigint)
+RETURNS void
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_clinic_id IS NULL OR p_date IS NULL OR p_delta = 0 THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.clinic_daily_counters (clinic_id, counter_date, appointments)
+  VALUES (p_clinic_id, p_date, p_delta)
+  ON CONFLICT (clinic_id, counter_date) DO UPDATE SET
+    appointments = clinic_daily_counters.appointments + EXCLUDED.appointments,
+    updated_at = now();
+END;
+$$;
+
+-- Only the triggers below may move counters; PostgREST would otherwise expose
+-- these owner-privileged helpers to every client at /rpc
+REVOKE EXECUTE ON FUNCTION public.bump_clinic_counter(uuid, text, bigint) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.bump_clinic_daily_counter(uuid, date, bigint) FROM PUBLIC, anon, authenticated;
+
+-- Appointments: total per clinic and per day
+CREATE OR REPLACE FUNCTION public.appointments_counters_trigger()
+RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.clinic_id IS NOT DISTINCT FROM NEW.clinic_id
+     AND OLD.appointment_date IS NOT DISTINCT FROM NEW.appointment_date THEN
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public.bump_clinic_counter(OLD.clinic_id, 'total_appointments', -1);
+    PERFORM public.bump_clinic_daily_counter(OLD.clinic_id, OLD.appointment_date, -1);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM public.bump_clinic_counter(NEW.clinic_id, 'total_appointments', 1);
+    PERFORM public.bump_clinic_daily_counter(NEW.clinic_id, NEW.appointment_date, 1);
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS appointments_counters ON public.appointments;
+CREATE TRIGGER appointments_counters
+  AFTER INSERT OR DELETE OR UPDATE OF clinic_id, appointment_date ON public.appointments
+  FOR EACH ROW EXECUTE FUNCTION public.appointments_counters_trigger();
+
+-- Lab tests: pending = ordered, collected or processing
+CREATE OR REPLACE FUNCTION public.lab_tests_counters_trigger()
+RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status IN ('ordered', 'collected', 'processing') THEN
+    PERFORM public.bump_clinic_counter(OLD.clinic_id, 'pending_lab_tests', -1);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status IN ('ordered', 'collected', 'processing') THEN
+    PERFORM public.bump_clinic_counter(NEW.clinic_id, 'pending_lab_tests', 1);
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS lab_tests_counters ON public.lab_tests;
+CREATE TRIGGER lab_tests_counters
+  AFTER INSERT OR DELETE OR UPDATE OF clinic_id, status ON public.lab_tests
+  FOR EACH ROW EXECUTE FUNCTION public.lab_tests_counters_trigger();
+
+-- Pharmacy items: low stock = quantity at or below its own reorder level
+CREATE OR REPLACE FUNCTION public.pharmacy_items_counters_trigger()
+RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND COALESCE(OLD.quantity_available <= OLD.reorder_level, false) THEN
+    PERFORM public.bump_clinic_counter(OLD.clinic_id, 'low_stock_items', -1);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') AND COALESCE(NEW.quantity_available <= NEW.reorder_level, false) THEN
+    PERFORM public.bump_clinic_counter(NEW.clinic_id, 'low_stock_items', 1);
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pharmacy_items_counters ON public.pharmacy_items;
+CREATE TRIGGER pharmacy_items_counters
+  AFTER INSERT OR DELETE OR UPDATE OF clinic_id, quantity_available, reorder_level ON public.pharmacy_items
+  FOR EACH ROW EXECUTE FUNCTION public.pharmacy_items_counters_trigger();
+
+-- Read path for /metrics/overview
+CREATE OR REPLACE FUNCTION public.get_clinic_counters(p_clinic_id uuid, p_date date)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'total_appointments', COALESCE(c.total_appointments, 0),
+    'pending_lab_tests', COALESCE(c.pending_lab_tests, 0),
+    'low_stock_items', COALESCE(c.low_stock_items, 0),
+    'patients_today', COALESCE(d.appointments, 0)
+  )
+  FROM (SELECT p_clinic_id AS clinic_id) AS k
+  LEFT JOIN public.clinic_counters c ON c.clinic_id = k.clinic_id
+  LEFT JOIN public.clinic_daily_counters d ON d.clinic_id = k.clinic_id AND d.counter_date = p_date;
+$$;
+
+-- Drift repair; returns the number of counter rows that had to be corrected
+CREATE OR REPLACE FUNCTION public.reconcile_clinic_counters(
+  p_clinic_id uuid DEFAULT NULL,
+  p_since date DEFAULT CURRENT_DATE - 1
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_totals integer;
+  v_daily integer;
+  v_cleared integer;
+BEGIN
+  WITH actual AS (
+    SELECT
+      c.id AS clinic_id,
+      (SELECT count(*) FROM public.appointments a WHERE a.clinic_id = c.id) AS total_appointments,
+      (SELECT count(*) FROM public.lab_tests l
+        WHERE l.clinic_id = c.id AND l.status IN ('ordered', 'collected', 'processing')) AS pending_lab_tests,
+      (SELECT count(*) FROM public.pharmacy_items p
+        WHERE p.clinic_id = c.id AND p.quantity_available <= p.reorder_level) AS low_stock_items
+    FROM public.clinics c
+    WHERE p_clinic_id IS NULL OR c.id = p_clinic_id
+  ), fixed AS (
+    INSERT INTO public.clinic_counters AS cc (clinic_id, total_appointments, pending_lab_tests, low_stock_items)
+    SELECT clinic_id, total_appointments, pending_lab_tests, low_stock_items FROM actual
+    ON CONFLICT (clinic_id) DO UPDATE SET
+      total_appointments = EXCLUDED.total_appointments,
+      pending_lab_tests = EXCLUDED.pending_lab_tests,
+      low_stock_items = EXCLUDED.low_stock_items,
+      updated_at = now()
+    WHERE (cc.total_appointments, cc.pending_lab_tests, cc.low_stock_items)
+      IS DISTINCT FROM (EXCLUDED.total_appointments, EXCLUDED.pending_lab_tests, EXCLUDED.low_stock_items)
+    RETURNING 1
+  )
+  SELECT count(*) INTO v_totals FROM fixed;
+
+  WITH actual AS (
+    SELECT clinic_id, appointment_date AS counter_date, count(*) AS appointments
+    FROM public.appointments
+    WHERE appointment_date >= p_since
+      AND clinic_id IS NOT NULL
+      AND (p_clinic_id IS NULL OR clinic_id = p_clinic_id)
+    GROUP BY clinic_id, appointment_date
+  ), fixed AS (
+    INSERT INTO public.clinic_daily_counters AS dc (clinic_id, counter_date, appointments)
+    SELECT clinic_id, counter_date, appointments FROM actual
+    ON CONFLICT (clinic_id, counter_date) DO UPDATE SET
+      appointments = EXCLUDED.appointments,
+      updated_at = now()
+    WHERE dc.appointments IS DISTINCT FROM EXCLUDED.appointments
+    RETURNING 1
+  )
+  SELECT count(*) INTO v_daily FROM fixed;
+
+  -- Days whose appointments have all moved or been deleted
+  UPDATE public.clinic_daily_counters dc
+  SET appointments = 0, updated_at = now()
+  WHERE dc.counter_date >= p_since
+    AND dc.appointments <> 0
+    AND (p_clinic_id IS NULL OR dc.clinic_id = p_clinic_id)
+    AND NOT EXISTS (
+      SELECT 1 FROM public.appointments a
+      WHERE a.clinic_id = dc.clinic_id AND a.appointment_date = dc.counter_date
+    );
+  GET DIAGNOSTICS v_cleared = ROW_COUNT;
+
+  RETURN v_totals + v_daily + v_cleared;
+END;
+$$;
+
+-- A full reconcile scans every base table; not something API callers may trigger
+REVOKE EXECUTE ON FUNCTION public.reconcile_clinic_counters(uuid, date) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reconcile_clinic_counters(uuid, date) TO service_role;
+
+-- Backfill from existing data
+SELECT public.reconcile_clinic_counters(NULL, '-infinity'::date);
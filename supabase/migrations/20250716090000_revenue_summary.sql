@@ -0,0 +1,48 @@
+/*
+  # Server-side revenue aggregation
+
+  1. Functions
+    - `revenue_summary(clinic_id, from, to, transaction_type)` - Sum, count and
+      per-category / per-payment-method totals for a clinic over a date range,
+      returned as one small JSON object. Amounts are rendered as text so the
+      API can parse them into Decimal without float rounding.
+
+  2. Indexes
+    - `accounts_tx(clinic_id, transaction_type, transaction_date)` covering the
+      aggregated columns, so the summary is an index-only range scan
+*/
+
+CREATE INDEX IF NOT EXISTS idx_accounts_tx_clinic_type_date
+  ON public.accounts_tx (clinic_id, transaction_type, transaction_date)
+  INCLUDE (amount, category, payment_method);
+
+CREATE OR REPLACE FUNCTION public.revenue_summary(
+  p_clinic_id uuid,
+  p_from date,
+  p_to date,
+  p_transaction_type text DEFAULT 'income'
+)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+  WITH tx AS (
+    SELECT amount, category, COALESCE(payment_method, 'unspecified') AS payment_method
+    FROM public.accounts_tx
+    WHERE clinic_id = p_clinic_id
+      AND transaction_type = p_transaction_type
+      AND transaction_date BETWEEN p_from AND p_to
+  )
+  SELECT json_build_object(
+    'total', (SELECT COALESCE(sum(amount), 0)::text FROM tx),
+    'count', (SELECT count(*) FROM tx),
+    'by_category', (
+      SELECT COALESCE(json_object_agg(category, total), '{}'::json)
+      FROM (SELECT category, sum(amount)::text AS total FROM tx GROUP BY category) AS c
+    ),
+    'by_payment_method', (
+      SELECT COALESCE(json_object_agg(payment_method, total), '{}'::json)
+      FROM (SELECT payment_method, sum(amount)::text AS total FROM tx GROUP BY payment_method) AS m
+    )
+  );
+$$;
@@ -0,0 +1,70 @@
+/*
+  # Appointment slot and token uniqueness
+
+  The API reserves slots and hands out token numbers from an in-memory map per
+  doctor and day. These indexes are the database-side guarantee that two
+  workers can never double-book a slot or reuse a token: the losing INSERT gets
+  a unique violation and the API resyncs and retries.
+
+  1. Indexes
+    - One active (scheduled, confirmed, in_progress) appointment per doctor,
+      date and time
+    - One token number per doctor and date
+
+  2. Existing data
+    - Duplicate token numbers are renumbered: the earliest booking keeps its
+      token and later ones move past the day's highest token
+    - Double-booked active slots are not resolved automatically, since
+      cancelling one of them is a decision for the clinic; the migration
+      aborts and lists how to find them
+*/
+
+WITH copies AS (
+  SELECT
+    id,
+    doctor_id,
+    appointment_date,
+    row_number() OVER (PARTITION BY doctor_id, appointment_date, token_number ORDER BY created_at, id) AS copy
+  FROM public.appointments
+  WHERE token_number IS NOT NULL
+), renumbered AS (
+  SELECT
+    c.id,
+    (SELECT max(a.token_number) FROM public.appointments a
+      WHERE a.doctor_id IS NOT DISTINCT FROM c.doctor_id AND a.appointment_date = c.appointment_date)
+      + row_number() OVER (PARTITION BY c.doctor_id, c.appointment_date ORDER BY c.id) AS token_number
+  FROM copies c
+  WHERE c.copy > 1
+)
+UPDATE public.appointments a
+SET token_number = r.token_number
+FROM renumbered r
+WHERE a.id = r.id;
+
+DO $$
+DECLARE
+  v_slots integer;
+BEGIN
+  SELECT count(*) INTO v_slots
+  FROM (
+    SELECT 1
+    FROM public.appointments
+    WHERE status IN ('scheduled', 'confirmed', 'in_progress')
+    GROUP BY doctor_id, appointment_date, appointment_time
+    HAVING count(*) > 1
+  ) AS doubled;
+
+  IF v_slots > 0 THEN
+    RAISE EXCEPTION '% appointment slots are double-booked; cancel or move the extra bookings before applying this migration', v_slots
+      USING HINT = 'SELECT doctor_id, appointment_date, appointment_time, array_agg(id) FROM public.appointments '
+        'WHERE status IN (''scheduled'', ''confirmed'', ''in_progress'') GROUP BY 1, 2, 3 HAVING count(*) > 1';
+  END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uniq_appointments_active_slot
+  ON public.appointments (doctor_id, appointment_date, appointment_time)
+  WHERE status IN ('scheduled', 'confirmed', 'in_progress');
+
+CREATE UNIQUE INDEX IF NOT EXISTS uniq_appointments_doctor_token
+  ON public.appointments (doctor_id, appointment_date, token_number);
@@ -0,0 +1,11 @@
+/*
+  # Keyset pagination index for appointments
+
+  GET /appointments/ pages through a clinic's appointments ordered by
+  (appointment_date, appointment_time, id) and resumes after the last row of
+  the previous page. This index serves both the clinic filter and the order,
+  so every page is a short index range scan regardless of depth.
+*/
+
+CREATE INDEX IF NOT EXISTS idx_appointments_clinic_keyset
+  ON public.appointments (clinic_id, appointment_date, appointment_time, id);
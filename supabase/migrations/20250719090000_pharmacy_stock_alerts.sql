@@ -0,0 +1,30 @@
+/*
+  # Pharmacy stock alerts
+
+  The pharmacist dashboard lists items that are low on stock or expiring soon.
+  "Low stock" compares two columns of the same row, which PostgREST filters
+  cannot express, so it is stored as a generated column and indexed.
+
+  1. Columns
+    - `pharmacy_items.is_low_stock`: quantity_available <= reorder_level,
+      maintained by Postgres on every write
+
+  2. Indexes
+    - `idx_pharmacy_items_low_stock`: partial index over a clinic's low-stock items
+    - `idx_pharmacy_items_clinic_expiry`: a clinic's items by expiry date
+
+  Both alert lists are then served by one query
+  (`clinic_id = $1 AND (is_low_stock OR expiry_date <= $2)`) that combines the
+  two indexes instead of scanning the clinic's inventory twice.
+*/
+
+ALTER TABLE public.pharmacy_items
+  ADD COLUMN IF NOT EXISTS is_low_stock boolean
+  GENERATED ALWAYS AS (COALESCE(quantity_available <= reorder_level, false)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_pharmacy_items_low_stock
+  ON public.pharmacy_items (clinic_id)
+  WHERE is_low_stock;
+
+CREATE INDEX IF NOT EXISTS idx_pharmacy_items_clinic_expiry
+  ON public.pharmacy_items (clinic_id, expiry_date);
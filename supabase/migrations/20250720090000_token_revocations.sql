@@ -0,0 +1,34 @@
+/*
+  # Revoked access tokens
+
+  Logout revokes the presented access token by its `jti` claim. Each API worker
+  keeps the revoked set in memory and pulls rows added since its last sync, so
+  authenticating a request never reads this table.
+
+  1. New Tables
+    - `revoked_tokens`: one row per revoked token, kept until the token expires
+      - `jti` (text, primary key)
+      - `expires_at` (timestamptz): the token's `exp`; expired rows are purged
+      - `created_at` (timestamptz): sync cursor for the workers
+
+  2. Security
+    - RLS enabled with no policies; only the service role reads or writes it
+
+  3. Indexes
+    - `idx_revoked_tokens_created_at`: incremental sync
+    - `idx_revoked_tokens_expires_at`: purge of expired rows
+*/
+
+CREATE TABLE IF NOT EXISTS public.revoked_tokens (
+  jti text PRIMARY KEY,
+  expires_at timestamptz NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.revoked_tokens ENABLE ROW LEVEL SECURITY;
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_created_at
+  ON public.revoked_tokens (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at
+  ON public.revoked_tokens (expires_at);
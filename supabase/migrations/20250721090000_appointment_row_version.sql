@@ -0,0 +1,34 @@
+/*
+  # Appointment row versions
+
+  `PATCH /appointments/{id}` is a single conditional UPDATE: the caller's
+  permission predicate and, when the client sends `If-Match`, the row version
+  go into the WHERE clause. A concurrent edit therefore fails with 412 instead
+  of being silently overwritten.
+
+  1. Columns
+    - `appointments.version`: starts at 1 and is incremented by a trigger on
+      every update, whichever code path writes the row
+
+  2. Functions and triggers
+    - `bump_row_version()`: generic BEFORE UPDATE trigger function
+    - `appointments_row_version` on `appointments`
+*/
+
+ALTER TABLE public.appointments
+  ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION public.bump_row_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.version := OLD.version + 1;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS appointments_row_version ON public.appointments;
+CREATE TRIGGER appointments_row_version
+  BEFORE UPDATE ON public.appointments
+  FOR EACH ROW EXECUTE FUNCTION public.bump_row_version();
@@ -0,0 +1,34 @@
+/*
+  # Composite indexes for the API's query shapes
+
+  `python -m bench.index_coverage` records the filter and order shape of every
+  query the routers build and checks it against the indexes declared here.
+  These are the gaps it reported, plus the pending lab test count that the
+  counter reconciliation runs inside SQL.
+
+  1. Indexes
+    - `appointments(clinic_id, doctor_id, appointment_date, appointment_time, id)`
+      for the appointment list filtered to one doctor: a doctor's own list and
+      reception's per-doctor view page in keyset order without a sort
+    - `doctors(clinic_id)` for loading a clinic's doctors for slot search
+    - `lab_tests(clinic_id)` limited to pending statuses, for the
+      `pending_lab_tests` counter
+
+  2. Removed
+    - `idx_appointments_clinic` and `idx_appointments_doctor`: leading-column
+      prefixes of `idx_appointments_clinic_keyset` and
+      `uniq_appointments_doctor_token`, which serve the same lookups
+*/
+
+CREATE INDEX IF NOT EXISTS idx_appointments_clinic_doctor_keyset
+  ON public.appointments (clinic_id, doctor_id, appointment_date, appointment_time, id);
+
+CREATE INDEX IF NOT EXISTS idx_doctors_clinic
+  ON public.doctors (clinic_id);
+
+CREATE INDEX IF NOT EXISTS idx_lab_tests_clinic_pending
+  ON public.lab_tests (clinic_id)
+  WHERE status IN ('ordered', 'collected', 'processing');
+
+DROP INDEX IF EXISTS public.idx_appointments_clinic;
+DROP INDEX IF EXISTS public.idx_appointments_doctor;